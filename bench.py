@@ -0,0 +1,358 @@
+import ast
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# --- AYARLAR ---
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APPS = ["excelweb.py", "wftemplatebot.py"]
+# Soğuk başlangıçta (henüz hiçbir araç kullanılmadan) yüklenmesine izin verilmeyen ağır paketler
+HEAVY_MODULES = {"pandas", "numpy", "openpyxl", "pypdf", "pyarrow"}
+# Script'in en üst seviye importlarının toplam süresi (streamlit dahil), ms
+IMPORT_BUDGET_MS = {"excelweb.py": 1500, "wftemplatebot.py": 1500}
+# Bellek ölçümünde üretilen veri dosyalarının satır sayıları
+MEMORY_SIZES = [int(n) for n in os.environ.get("ASIR_BENCH_SIZES", "250,1000,2500").split(",")]
+# Aşama başına bütçe: sabit MB + satır başına KB (tracemalloc tepe değeri, aşama başındaki kullanım hariç)
+MEMORY_BUDGETS = {
+    "wayfair.read": (4, 3), "wayfair.template": (4, 0), "wayfair.rows": (8, 14), "wayfair.save": (8, 4),
+    "data.load": (8, 5), "data.transform": (8, 10), "data.style": (8, 3), "data.save": (8, 5),
+}
+# Süreç RSS'i için mutlak üst sınır, MB (ölçüm sonundaki en yüksek RSS)
+RSS_BUDGET_MB = int(os.environ.get("ASIR_BENCH_RSS_MB", "1024"))
+HISTORY_PATH = os.environ.get("ASIR_BENCH_HISTORY", os.path.join(ROOT, "bench_history.jsonl"))
+MB = 1024 * 1024
+
+
+def top_level_imports(script):
+    with open(os.path.join(ROOT, script), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    mods = []
+    for node in tree.body:
+        if isinstance(node, ast.Import): mods.extend(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level: mods.append(node.module)
+    return list(dict.fromkeys(mods))
+
+
+def measure_importtime(mods):
+    # Her ölçüm temiz bir yorumlayıcıda: -X importtime çıktısı stderr'e "self | cumulative | name" satırları yazar
+    code = "; ".join(f"import {m}" for m in mods)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0: raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    cumulative, loaded = {}, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line: continue
+        _, cum, name = line[len("import time:"):].split("|")
+        if not cum.strip().isdigit(): continue
+        loaded.add(name.strip())
+        if not name.startswith("  "): cumulative[name.strip()] = int(cum) / 1000
+    return cumulative, loaded
+
+
+def check_importtime():
+    failures = []
+    for app in APPS:
+        mods = top_level_imports(app)
+        cumulative, loaded = measure_importtime(mods)
+        total = sum(cumulative.get(m, 0) for m in mods)
+        heavy = sorted(m for m in loaded if m.split(".")[0] in HEAVY_MODULES)
+        heavy_roots = sorted({m.split(".")[0] for m in heavy})
+        budget = IMPORT_BUDGET_MS[app]
+        print(f"{app}: {total:.0f} ms / {budget} ms  ({', '.join(f'{m}={cumulative.get(m, 0):.0f}' for m in mods)})")
+        if heavy_roots: failures.append(f"{app}: heavy modules loaded at cold start: {', '.join(heavy_roots)}")
+        if total > budget: failures.append(f"{app}: import time {total:.0f} ms exceeds budget {budget} ms")
+    return failures
+
+
+# --- BELLEK ---
+FEATURE_SAMPLES = [
+    "Width: 120 cm\nHeight: 80 cm\nDepth: 40 cm\nMaterial: wood",
+    "Duvet cover set 200x220 cm\nPillowcase 2 pieces\nCotton",
+    "Ø 30 cm lamp\nHeight: 45cm\n1.5 kg",
+    "Velvet sofa\nW: 210 H: 85 D: 90\nLeg: metal 12 cm\nSeat\nCushion\nFrame",
+]
+TEMPLATE_COLUMNS = [
+    ("core::supplierPartNumber", "Supplier Part Number"), ("core::manufacturerPartNumber", "Manufacturer Part Number"),
+    ("core::universalProductCode", "UPC"), ("core::productName", "Product Name"), ("price::wholesalePrice", "Wholesale Price"),
+    ("attr::oh", "Overall Height"), ("attr::ow", "Overall Width"), ("attr::od", "Overall Depth"), ("attr::color", "Color"),
+    ("core::manufacturerId", "Brand"), ("shippingAndFulfillment::weight", "Weight"), ("shippingAndFulfillment::height", "Height"),
+    ("shippingAndFulfillment::width", "Width"), ("shippingAndFulfillment::depth", "Depth"), ("shippingAndFulfillment::shipType", "Ship Type"),
+] + [(f"media::i{i}", f"Image File Name or URL {i}") for i in range(1, 6)] + [("featureDescription::genericFeatures", f"Feature {i}") for i in range(1, 6)]
+
+
+def make_data_file(rows, edit=None):
+    # edit(records): kayıtları yazmadan önce değiştirir (delta kontrolü için)
+    import pandas as pd
+    records = [{
+        "CODE": f"SKU{i}", "EAN CODE": 8690000000000 + i, "COLOR": "Red/Blue", "DESCRIPTION": f"Product {i}",
+        "FEATURES": FEATURE_SAMPLES[i % len(FEATURE_SAMPLES)], "EXTRA FEATURES": "", "PRICE": 10 + i, "RETAIL PRICE": 20 + i,
+        "NUMBER OF PACKAGES": 1, "WEIGHT (Kg)": 3.5 + i % 4, "PACKAGING SIZE - X (cm)": 50, "PACKAGING SIZE - Y (cm)": 40,
+        "PACKAGING SIZE - Z (cm)": 30, "CATEGORY": ["Bedroom", "Sofa", "Rug", "Lighting"][i % 4],
+        **{f"IMAGE {k}": f"http://img.test/{i}/{k}.jpg" for k in range(1, 8 if i % 3 == 0 else 3)},
+    } for i in range(rows)]
+    if edit: edit(records)
+    buf = io.BytesIO()
+    pd.DataFrame(records).to_excel(buf, index=False)
+    buf.seek(0)
+    return buf
+
+
+def make_template_file():
+    import openpyxl
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Beds"
+    for c, (wid, name) in enumerate(TEMPLATE_COLUMNS, 1):
+        ws.cell(1, c, wid); ws.cell(3, c, "Required" if c % 2 else "Optional"); ws.cell(4, c, name)
+    ai = wb.create_sheet("Additional Images")
+    ai["A1"], ai["B1"], ai["A4"], ai["B4"] = "core::supplierPartNumber", "media::url", "Supplier Part Number", "Image File Name or URL"
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return buf
+
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Linux dışı: sadece tepe değer bilinir
+
+
+class StageMeter:
+    # process_* fonksiyonlarının stage_callback'i: her aşamanın kendi ek tracemalloc tepesini ve sonundaki RSS'i kaydeder
+    def __init__(self, prefix, results):
+        self.prefix = prefix
+        self.results = results
+        self._begin()
+
+    def _begin(self):
+        self.base = tracemalloc.get_traced_memory()[0]
+        self.started = time.perf_counter()
+        tracemalloc.reset_peak()
+
+    def __call__(self, stage):
+        current, peak = tracemalloc.get_traced_memory()
+        self.results[f"{self.prefix}.{stage}"] = {
+            "peak_mb": round((peak - self.base) / MB, 2), "retained_mb": round((current - self.base) / MB, 2),
+            "rss_mb": round(current_rss() / MB, 1), "seconds": round(time.perf_counter() - self.started, 3),
+        }
+        self._begin()
+
+
+def measure_memory_run(rows):
+    # Temiz yorumlayıcıda çalışır (bkz. check_memory): önceki boyutların RSS'i ölçümü kirletmez
+    sys.path.insert(0, ROOT)
+    import wayfaircore
+    from templatepool import TEMPLATE_POOL
+    TEMPLATE_POOL.spares = 0  # Arka planda şablon parse eden thread ölçüme karışmasın
+    data_file, template_file = make_data_file(rows), make_template_file()
+    results = {}
+    tracemalloc.start()
+    ui_data = {"is_us": True, "dyn_drops": {}, "dim_mappings": {"h": [], "w": [], "d": []}, "workers": 1}
+    export, *_ = wayfaircore.process_wayfair_v19(data_file, template_file, ui_data, stage_callback=StageMeter("wayfair", results))
+    export.close()
+    wayfaircore.process_data_excel_only(data_file, True, stage_callback=StageMeter("data", results)).close()
+    tracemalloc.stop()
+    return results
+
+
+def memory_failures(rows, results, max_rss_mb):
+    failures = []
+    for stage, r in results.items():
+        fixed_mb, per_row_kb = MEMORY_BUDGETS.get(stage, (0, 0))
+        budget = fixed_mb + rows * per_row_kb / 1024
+        if fixed_mb and r["peak_mb"] > budget:
+            failures.append(f"{stage} @ {rows} rows: peak {r['peak_mb']:.1f} MB exceeds budget {budget:.1f} MB")
+    if max_rss_mb > RSS_BUDGET_MB:
+        failures.append(f"{rows} rows: RSS {max_rss_mb:.0f} MB exceeds budget {RSS_BUDGET_MB} MB")
+    return failures
+
+
+def load_history():
+    if not os.path.exists(HISTORY_PATH): return []
+    with open(HISTORY_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def git_revision():
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return proc.stdout.strip() or None
+
+
+def check_memory():
+    failures, runs = [], {}
+    previous = {}
+    for entry in load_history():
+        previous.update(entry["runs"])
+    for rows in MEMORY_SIZES:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "_memory_run", str(rows)], cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            failures.append(f"memory run @ {rows} rows crashed: {(proc.stderr.strip().splitlines() or ['?'])[-1]}")
+            continue
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        runs[str(rows)] = run
+        print(f"{rows} rows (max RSS {run['max_rss_mb']:.0f} MB):")
+        for stage, r in run["stages"].items():
+            old = previous.get(str(rows), {}).get("stages", {}).get(stage)
+            trend = f"  ({r['peak_mb'] - old['peak_mb']:+.1f} MB vs last)" if old else ""
+            print(f"  {stage:<18} peak {r['peak_mb']:>8.1f} MB  retained {r['retained_mb']:>8.1f} MB  rss {r['rss_mb']:>7.0f} MB  {r['seconds']:>6.2f} s{trend}")
+        failures.extend(memory_failures(rows, run["stages"], run["max_rss_mb"]))
+    if runs:
+        entry = {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "rev": git_revision(), "python": sys.version.split()[0], "runs": runs}
+        with open(HISTORY_PATH, "a", encoding="utf-8") as f: f.write(json.dumps(entry) + "\n")
+    return failures
+
+
+# --- DELTA ---
+DELTA_ROWS = 12
+
+
+def delta_run(data_file, template_file, baseline_file=None):
+    sys.path.insert(0, ROOT)
+    from wayfaircore import process_wayfair_v19
+    ui_data = {"is_us": True, "dyn_drops": {}, "dim_mappings": {"h": [], "w": [], "d": []}, "missing_cols": []}
+    export, processed, skipped, errors = process_wayfair_v19(data_file, template_file, ui_data, baseline_file=baseline_file)
+    return io.BytesIO(export.read()), processed, ui_data.get("delta_report", [])
+
+
+def check_delta():
+    # Önceki çıktıya göre: değişmeyen katalog hiç satır yazmaz; ek resimleri silinen SKU değişmiş sayılır
+    failures = []
+    baseline, _, _ = delta_run(make_data_file(DELTA_ROWS), make_template_file())
+
+    def drop_extra_images(records):
+        for k in (6, 7): records[0][f"IMAGE {k}"] = ""
+
+    cases = [("unchanged", None, []), ("extra images removed", drop_extra_images, [("SKU0", "Additional Images")])]
+    for name, edit, expected in cases:
+        baseline.seek(0)
+        _, processed, report = delta_run(make_data_file(DELTA_ROWS, edit), make_template_file(), baseline)
+        got = [(r["Ürün Kodu"], r["Değişen Alanlar"]) for r in report]
+        print(f"delta {name:<26} {processed} row(s) written  {got}")
+        if got != expected or processed != len(expected): failures.append(f"delta {name}: expected {expected}, got {got} ({processed} row(s) written)")
+
+    # Aynı SKU iki satırda: her satır baseline'daki kendi sırasındaki satırla karşılaştırılır
+    def duplicate_sku(records):
+        records[1]["CODE"] = "SKU0"
+
+    def edit_duplicate(records):
+        duplicate_sku(records)
+        records[1]["PRICE"] = 99
+
+    dup_baseline, _, _ = delta_run(make_data_file(DELTA_ROWS, duplicate_sku), make_template_file())
+    for name, edit, expected_skus in [("duplicate sku unchanged", duplicate_sku, []), ("duplicate sku 2nd row", edit_duplicate, ["SKU0"])]:
+        dup_baseline.seek(0)
+        _, processed, report = delta_run(make_data_file(DELTA_ROWS, edit), make_template_file(), dup_baseline)
+        got = [(r["Ürün Kodu"], r["Değişen Alanlar"]) for r in report]
+        print(f"delta {name:<26} {processed} row(s) written  {got}")
+        if [sku for sku, _ in got] != expected_skus or processed != len(expected_skus):
+            failures.append(f"delta {name}: expected {expected_skus}, got {got} ({processed} row(s) written)")
+    return failures
+
+
+# --- RESİM LİNKİ KONTROLÜ (yerel stub sunucu) ---
+STUB_TIMEOUT = 1.0
+
+
+def start_image_stub():
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args): pass
+
+        def reply(self, status, ctype="", headers=(), body=b""):
+            self.send_response(status)
+            if ctype: self.send_header("Content-Type", ctype)
+            for k, v in headers: self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command == "GET": self.wfile.write(body)
+
+        def do_HEAD(self):
+            if self.path.startswith("/nohead"): return self.reply(405)
+            self.do_GET()
+
+        def do_GET(self):
+            path = self.path
+            if path.startswith("/slow"): time.sleep(STUB_TIMEOUT * 3)
+            if path.startswith("/trickle"):
+                # Başlıklar soket zaman aşımından kısa aralıklarla damla damla gelir; sadece toplam süre sınırı yakalar
+                self.wfile.write(b"HTTP/1.1 200 OK\r\n")
+                for _ in range(int(STUB_TIMEOUT * 8 / 0.4)):
+                    self.wfile.write(b"X-Pad: 1\r\n")
+                    self.wfile.flush()
+                    time.sleep(0.4)
+                self.close_connection = True
+                return
+            if path.startswith("/redirect"): return self.reply(302, headers=[("Location", "/ok.jpg")])
+            if path.startswith("/missing"): return self.reply(404)
+            self.reply(200, "text/html" if path.startswith("/page") else "image/jpeg", body=b"x" * 64)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check_imagecheck():
+    sys.path.insert(0, ROOT)
+    from imagecheck import ImageUrlChecker
+    server = start_image_stub()
+    base = f"http://127.0.0.1:{server.server_port}"
+    expected = {
+        f"{base}/ok.jpg": (True, "HTTP 200"), f"{base}/nohead.jpg": (True, "HTTP 200"), f"{base}/redirect.jpg": (True, "HTTP 200"),
+        f"{base}/missing.jpg": (False, "HTTP 404"), f"{base}/page.html": (False, "not an image (text/html)"),
+        f"{base}/slow.jpg": (False, "timeout"), "http://127.0.0.1:1/refused.jpg": (False, "host unreachable"),
+    }
+    # Host başına tek istek: yavaş yanıttan sonra sıradaki link yine denenmeli, "host unreachable" sayılmamalı
+    serial = {f"{base}/trickle.jpg": (False, "timeout"), f"{base}/ok.jpg?after-trickle": (True, "HTTP 200")}
+    refused = ["http://127.0.0.1:1/a.jpg", "http://127.0.0.1:1/b.jpg"]
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            started = time.monotonic()
+            results = ImageUrlChecker(cache_path=None, timeout=STUB_TIMEOUT).verify(list(expected))
+            print(f"imagecheck {len(expected)} url(s) in {time.monotonic() - started:.2f}s")
+            serial_checker = ImageUrlChecker(cache_path=None, per_host=1, timeout=STUB_TIMEOUT)
+            results.update(serial_checker.verify(list(serial)))
+            cached_checker = ImageUrlChecker(cache_path=os.path.join(tmp, "image_check.sqlite3"), per_host=1, timeout=STUB_TIMEOUT)
+            cached_checker.verify(refused)
+            # İlk link gerçekten denendi; ikincisi ölü host kısayolundan geldi ve önbelleğe yazılmamalı
+            cached = cached_checker.cache.get_many(refused)
+        finally:
+            server.shutdown()
+    for url, (ok, detail) in {**expected, **serial}.items():
+        got = results.get(url)
+        if got is None or got[0] != ok or not got[1].startswith(detail): failures.append(f"imagecheck {url}: expected {(ok, detail)}, got {got}")
+    if sorted(cached) != refused[:1]: failures.append(f"imagecheck cache: expected only {refused[0]} cached, got {sorted(cached)}")
+    return failures
+
+
+CHECKS = {"importtime": check_importtime, "memory": check_memory, "delta": check_delta, "imagecheck": check_imagecheck}
+
+
+def main(argv):
+    if argv[:1] == ["_memory_run"]:
+        stages = measure_memory_run(int(argv[1]))
+        import resource
+        print(json.dumps({"stages": stages, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+        return 0
+    names = argv or list(CHECKS)
+    failures = []
+    for name in names:
+        if name not in CHECKS: raise SystemExit(f"unknown check: {name} (choose from {', '.join(CHECKS)})")
+        failures.extend(CHECKS[name]())
+    for f in failures: print(f"FAIL {f}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
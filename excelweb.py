@@ -1,106 +1,32 @@
-import pandas as pd
-import math
-import re
-import io
 import os
+import time
 from datetime import datetime
 import streamlit as st
-import pypdf
-from openpyxl.styles import Alignment
-
-# --- CONSTANTS ---
-KG_TO_LBS = 2.20462
-CM_TO_INCH = 0.393701
-MADE_IN_TURKEY = "Made In Türkiye"
-
-# --- HELPER FUNCTIONS (GENERAL & WF TEMPLATE TOOL) ---
-def extract_dimensions_from_string(text_to_search):
-    def find_dimension_value(pattern, text):
-        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-        if match:
-            try:
-                value_str = match.group(1).replace(',', '.')
-                return float(value_str)
-            except: return None
-        return None
-    w = find_dimension_value(r'(?:Width|Genişlik):\s*(\d+(?:[.,]\d+)?)', text_to_search)
-    h = find_dimension_value(r'(?:Height|Yükseklik):\s*(\d+(?:[.,]\d+)?)', text_to_search)
-    d = find_dimension_value(r'(?:Depth|Derinlik):\s*(\d+(?:[.,]\d+)?)', text_to_search)
-    l = find_dimension_value(r'(?:Length|Uzunluk):\s*(\d+(?:[.,]\d+)?)', text_to_search)
-    diam = find_dimension_value(r'(?:Diameter|Çap):\s*(\d+(?:[.,]\d+)?)', text_to_search)
-    y_val = d if d is not None else l
-    if w is not None and h is not None and y_val is not None: return (w, y_val, h)
-    if diam is not None and h is not None: return (diam, diam, h)
-    xyz_pattern = r'(\d+(?:[.,]\d+)?)\s*[xX]\s*(\d+(?:[.,]\d+)?)(?:\s*[xX]\s*(\d+(?:[.,]\d+)?))?'
-    match = re.search(xyz_pattern, text_to_search)
-    if match:
-        try:
-            x = float(match.group(1).replace(',', '.'))
-            y = float(match.group(2).replace(',', '.'))
-            z = float(match.group(3).replace(',', '.')) if match.group(3) else None
-            return (x, y, z)
-        except: return None
-    return None
-
-def clean_feature_list(features_str):
-    if pd.isna(features_str) or features_str == "": return []
-    features = re.split(r'\s*(?:\\n|\n)\s*', str(features_str).strip())
-    return [f.strip() for f in features if f and f.strip()]
-
-def convert_size_value(val, unit_choice):
-    if val is None or val == '' or (isinstance(val, float) and math.isnan(val)): return ''
-    try:
-        num_val = float(str(val).replace(',', '.'))
-        return round(num_val * CM_TO_INCH, 2) if unit_choice == "inch" else round(num_val, 2)
-    except: return val
-
-def convert_weight_value(val_kg, weight_unit_choice):
-    if val_kg is None or val_kg == '' or (isinstance(val_kg, float) and math.isnan(val_kg)): return ''
-    try:
-        num_val = float(str(val_kg).replace(',', '.'))
-        if weight_unit_choice == "LBS":
-            c_lbs = round(num_val * KG_TO_LBS, 2)
-            return c_lbs, max(0.0, round(c_lbs - 0.01, 2))
-        return round(num_val, 2), round(num_val, 2)
-    except: return val_kg, val_kg
-
-# --- HELPER FUNCTIONS (PO TRACKING TOOL - ROBUST VERSION) ---
-def process_pdfs_robust(pdf_files):
-    all_data = {}
-    po_pattern = re.compile(r"((?:CS|CA)\d{9,})")
-    # Gelişmiş Tracking Regex: 00 ile başlayan 18-20 hane veya 12-15 haneli numaraları yakalar
-    # Barkodlardan kaçınmak için etrafında harf/rakam olmayan izole sayıları arar
-    trk_pattern = re.compile(r"(?<![a-zA-Z0-9])(\d{12,20})(?![a-zA-Z0-9])")
-    
-    for pdf_file in pdf_files:
-        try:
-            reader = pypdf.PdfReader(pdf_file)
-            for page in reader.pages:
-                text = page.extract_text()
-                if not text: continue
-                
-                # --- ÇİFT KATMANLI TARAMA MANTIĞI ---
-                chunks = po_pattern.split(text)
-                for j in range(1, len(chunks), 2):
-                    po_number = chunks[j].strip()
-                    content_after_po = chunks[j+1]
-                    
-                    found_trks = trk_pattern.findall(content_after_po)
-                    if found_trks:
-                        if po_number not in all_data: all_data[po_number] = set()
-                        for t in found_trks:
-                            # 26 ile başlayan dikey statik kodları eliyoruz
-                            if not t.startswith("26"):
-                                all_data[po_number].add(t)
-        except Exception as e:
-            st.error(f"Error: {pdf_file.name} - {e}")
-    
-    final_rows = []
-    for po in sorted(all_data.keys()):
-        trks = sorted(list(all_data[po]))
-        if trks:
-            final_rows.append({"PO": po, "TRK": ", ".join(trks)})
-    return pd.DataFrame(final_rows)
+from exportspool import XLSX_MIME, ZIP_MIME, SPOOL_TTL_SECONDS, spool_writer, keep_latest
+from memocache import file_digest
+from pagedpreview import paged_preview
+from poindex import PoIndex, parse_po_list, LOOKUP_COLUMNS, EXPORT_COLUMNS
+
+# Ağır bağımlılıklar (pandas, openpyxl, pypdf) ve araç yardımcıları sayfa ilk kullanıldığında yüklenir:
+# WF Template Tool -> wftemplatetool.py, PO Tracking Tool -> potracking.py
+
+CACHE_TTL_MARGIN_SECONDS = 5 * 60
+
+@st.cache_resource
+def get_po_index():
+    return PoIndex()
+
+# WF Template Tool sonucu (önizleme + çıktı dosyası) dosya özeti ve ayarlarla saklanır; indirme tıklaması veya
+# ilgisiz bir widget değişikliği yeniden dönüştürme yapmaz. Önbellek kaydı spool'daki çıktıdan önce düşer:
+# çıktının süresi yazım bitince başlar, her gösterimde uzar; önbellek TTL'i ayrıca bir pay kadar kısadır.
+@st.cache_resource(max_entries=16, ttl=SPOOL_TTL_SECONDS - CACHE_TTL_MARGIN_SECONDS, show_spinner="Converting...")
+def convert_wf_template(file_hash, _uploaded_file, output_filename, size_unit, weight_unit, add_made_in_tr, feature_count):
+    import pandas as pd
+    from wftemplatetool import convert_template_frame, write_formatted_template
+    _uploaded_file.seek(0)
+    df = pd.read_excel(_uploaded_file, dtype=str).fillna('')
+    out_df = convert_template_frame(df, size_unit, weight_unit, add_made_in_tr, feature_count)
+    return out_df, spool_writer(lambda output: write_formatted_template(output, out_df), output_filename)
 
 # --- APP INTERFACE ---
 st.set_page_config(page_title="Asir Tools", layout="wide")
@@ -133,85 +59,102 @@ if page == "WF Template Tool":
         add_made_in_tr = st.checkbox("Add 'Made in Türkiye'", value=True)
         feature_count = st.slider("Feature Column Count:", 1, 10, 5)
 
-    uploaded_file = st.file_uploader("Upload Excel file", type=["xlsx", "xls"])
+    batch_mode = st.toggle("Batch mode (several files, one zip)", key="wf_batch_mode")
+    if batch_mode:
+        batch_files = st.file_uploader("Upload Excel files", type=["xlsx", "xls"], accept_multiple_files=True, key="wf_batch_files")
+        if batch_files and st.button(f"Convert {len(batch_files)} file(s)", use_container_width=True):
+            import pandas as pd
+            from wftemplatetool import write_template_batch
+            progress_bar = st.progress(0.0, text="Converting...")
+            def update_progress(done, total, name): progress_bar.progress(done / total, text=f"{done}/{total} · {name}")
+            files = [(f.name, f.getvalue()) for f in batch_files]
+            settings = (size_unit, weight_unit, add_made_in_tr, feature_count)
+            summary = {}
+            def write_zip(output): summary['df'] = write_template_batch(output, files, settings, update_progress)
+            zip_name = f"WF_Templates_{datetime.now().strftime('%d-%m-%Y')}.zip"
+            export = keep_latest(st.session_state, 'wf_batch_export', spool_writer(write_zip, zip_name))
+            summary_df = summary['df']
+            failed = int((summary_df['Error'] != '').sum())
+            st.caption(f"{len(files) - failed} of {len(files)} file(s) converted · {int(summary_df['Rows Out'].sum()):,} row(s) · slowest file {summary_df['Seconds'].max():.1f}s")
+            if failed: st.warning(f"{failed} file(s) could not be converted; see the Error column.")
+            st.dataframe(summary_df, hide_index=True, width='stretch')
+            st.download_button(f"Download {zip_name}", export.read, export.file_name, mime=ZIP_MIME, use_container_width=True, on_click="ignore")
+
+    uploaded_file = None if batch_mode else st.file_uploader("Upload Excel file", type=["xlsx", "xls"])
     if uploaded_file:
         try:
             file_base, file_ext = os.path.splitext(uploaded_file.name)
             output_filename = f"{file_base}_processed{file_ext}"
-            df = pd.read_excel(uploaded_file, dtype=str).fillna('')
-            processed_data = []
-            
-            f_headers = [f'Feature {i+1}' for i in range(feature_count)]
-            u_s, u_w = f"({size_unit})", f"({weight_unit})"
-            output_headers = ['CODE', 'EAN CODE', 'COLOR', 'DESCRIPTION'] + f_headers + \
-                             ['IMAGE', 'PRICE', ' ', 'RETAIL PRICE', 'NUMBER OF PACKAGES', f'WEIGHT {u_w}',
-                              f'PRODUCT SIZE - X {u_s}', f'PRODUCT SIZE - Y {u_s}', f'PRODUCT SIZE - Z {u_s}',
-                              f'CARTON WEIGHT {u_w}', f'PACKAGING SIZE - X {u_s}', f'PACKAGING SIZE - Y {u_s}', f'PACKAGING SIZE - Z {u_s}']
-
-            for index, row in df.iterrows():
-                code = str(row.get('CODE', '')).strip()
-                if not code or code.lower() == 'nan': continue
-                feat_list = clean_feature_list(row.get('FEATURES', ''))
-                extra = str(row.get('EXTRA FEATURES', ''))
-                if "number of packages" not in extra.lower(): feat_list.extend(clean_feature_list(extra))
-                if add_made_in_tr and not any(MADE_IN_TURKEY in str(f) for f in feat_list): feat_list.append(MADE_IN_TURKEY)
-                
-                f_cols = [""] * feature_count
-                if feature_count > 1:
-                    for i in range(min(len(feat_list), feature_count - 1)): f_cols[i] = feat_list[i]
-                    if len(feat_list) >= feature_count: f_cols[feature_count-1] = "\n".join(feat_list[feature_count-1:])
-                elif feat_list: f_cols[0] = "\n".join(feat_list)
-
-                dims = extract_dimensions_from_string(str(row.get('FEATURES', '')) + "\n" + extra)
-                px, py, pz = dims if dims else ('', '', '')
-                c_w, p_w = convert_weight_value(row.get('WEIGHT (Kg)', ''), weight_unit)
-
-                processed_data.append([code, row.get('EAN CODE', ''), str(row.get('COLOR', '')).replace('\n', ';'), row.get('DESCRIPTION', '')] + f_cols + \
-                                      [row.get('IMAGE', ''), row.get('PRICE', ''), '', row.get('RETAIL PRICE', ''), row.get('NUMBER OF PACKAGES', ''),
-                                       p_w, convert_size_value(px, size_unit), convert_size_value(py, size_unit), convert_size_value(pz, size_unit),
-                                       c_w, convert_size_value(row.get('PACKAGING SIZE - X (cm)', ''), size_unit),
-                                       convert_size_value(row.get('PACKAGING SIZE - Y (cm)', ''), size_unit), convert_size_value(row.get('PACKAGING SIZE - Z (cm)', ''), size_unit)])
-
-            out_df = pd.DataFrame(processed_data, columns=output_headers)
-            st.dataframe(out_df)
-
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                out_df.to_excel(writer, index=False, sheet_name='Sheet1')
-                ws = writer.sheets['Sheet1']
-                al_center = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                al_left = Alignment(horizontal='left', vertical='center', wrap_text=True)
-                for c_idx, c_name in enumerate(output_headers, 1):
-                    letter = ws.cell(row=1, column=c_idx).column_letter
-                    if "Feature" in str(c_name): ws.column_dimensions[letter].width = 15
-                    elif any(w in str(c_name) for w in ["PRICE", "SIZE", "WEIGHT", "PACKAGES"]):
-                        m_data = max([len(str(ws.cell(row=r, column=c_idx).value)) for r in range(2, len(out_df)+2)] + [0])
-                        ws.column_dimensions[letter].width = m_data + 5
-                    else:
-                        m_all = max([len(str(ws.cell(row=r, column=c_idx).value)) for r in range(1, len(out_df)+2)] + [0])
-                        ws.column_dimensions[letter].width = min(m_all + 2, 40)
-                    for r_idx in range(1, len(out_df) + 2):
-                        cell = ws.cell(row=r_idx, column=c_idx)
-                        cell.alignment = al_left if (r_idx > 1 and "Feature" in str(c_name)) else al_center
-                        if r_idx > 1: ws.row_dimensions[r_idx].height = 15
-                ws.row_dimensions[1].height = 45
-            st.download_button("Download Processed Excel", output.getvalue(), output_filename, use_container_width=True)
+            # Aynı çıktı başka oturumlarla paylaşılabilir; keep_latest ile kapatılmaz, TTL ile temizlenir
+            out_df, export = convert_wf_template(file_digest(uploaded_file), uploaded_file, output_filename,
+                                                 size_unit, weight_unit, add_made_in_tr, feature_count)
+            export.touch()
+            paged_preview(out_df, 'wf_preview', search_cols=('CODE',))
+            st.download_button("Download Processed Excel", export.read, export.file_name, mime=XLSX_MIME, use_container_width=True, on_click="ignore")
         except Exception as e: st.error(f"Error: {e}")
 
 # --- PAGE 2: PO TRACKING TOOL ---
 elif page == "PO Tracking Tool":
     st.header("PO Tracking Tool")
+    po_index = get_po_index()
     pdf_files = st.file_uploader("Upload PDF files", type="pdf", accept_multiple_files=True)
+    master_file = st.file_uploader("Optional: open-PO master list (joined with the results)", type=["xlsx", "xls", "csv"], key="po_master")
     if pdf_files:
+        save_to_index = st.checkbox("Save results to tracking index", value=True)
         if st.button("Extract Data", use_container_width=True):
             with st.spinner("Analyzing PDF layers..."):
-                results_df = process_pdfs_robust(pdf_files)
+                import pandas as pd
+                from potracking import process_pdfs_robust, PAGE_TIMEOUT_SECONDS
+                scan_stats = {}
+                results_df = process_pdfs_robust(pdf_files, stats=scan_stats, index=po_index if save_to_index else None)
+                st.caption(f"Pages: {scan_stats['pages']} total, {scan_stats['scanned']} scanned, {scan_stats['skipped']} skipped (no PO marker), {scan_stats['timed_out']} timed out · {scan_stats['from_index']} file(s) already indexed")
+                if scan_stats['timeouts']:
+                    st.warning(f"{len(scan_stats['timeouts'])} page(s) took longer than {PAGE_TIMEOUT_SECONDS:.0f}s and were skipped. Please check them by hand; these files were not saved to the index.")
+                    paged_preview(pd.DataFrame(scan_stats['timeouts']), 'po_timeouts', search_cols=('File',))
                 if not results_df.empty:
-                    st.dataframe(results_df)
+                    paged_preview(results_df, 'po_results', search_cols=('PO', 'TRK'))
                     current_date = datetime.now().strftime("%d-%m-%Y")
                     date_filename = f"{current_date}_Tracking_List.xlsx"
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        results_df.to_excel(writer, index=False)
-                    st.download_button(f"Download {date_filename}", output.getvalue(), date_filename, use_container_width=True)
+                    def write_tracking_list(output):
+                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                            results_df.to_excel(writer, index=False)
+                    export = keep_latest(st.session_state, 'po_tracking_export', spool_writer(write_tracking_list, date_filename))
+                    st.download_button(f"Download {date_filename}", export.read, export.file_name, mime=XLSX_MIME, use_container_width=True, on_click="ignore")
+                    if master_file:
+                        from potracking import read_master_po_list, join_master_po_list, write_master_workbook, MASTER_STATUS_MISSING, MASTER_STATUS_SHARED
+                        try:
+                            started = time.perf_counter()
+                            enriched, unmatched, po_col = join_master_po_list(read_master_po_list(master_file), results_df)
+                            join_ms = (time.perf_counter() - started) * 1000
+                            status = enriched["Tracking Status"].value_counts()
+                            st.subheader("📋 Open-PO Master List")
+                            st.caption(f"{len(enriched):,} row(s) joined on '{po_col}' in {join_ms:.0f} ms · {status.get(MASTER_STATUS_MISSING, 0):,} without tracking · "
+                                       f"{status.get(MASTER_STATUS_SHARED, 0):,} sharing a tracking number with another PO · {len(unmatched):,} extracted PO(s) not in the list")
+                            paged_preview(enriched, 'po_master_preview', search_cols=(po_col, 'Tracking', 'Tracking Status'))
+                            master_filename = f"{current_date}_Open_PO_Tracking.xlsx"
+                            master_export = keep_latest(st.session_state, 'po_master_export', spool_writer(lambda output: write_master_workbook(output, enriched, unmatched), master_filename))
+                            st.download_button(f"Download {master_filename}", master_export.read, master_export.file_name, mime=XLSX_MIME, use_container_width=True, on_click="ignore")
+                        except Exception as e: st.error(f"Master list: {e}")
                 else: st.warning("No valid tracking numbers found.")
+
+    st.divider()
+    st.subheader("🔎 Tracking Index Lookup")
+    idx_stats = po_index.stats()
+    st.caption(f"Index: {idx_stats['files']} file(s), {idx_stats['pos']} PO(s), {idx_stats['rows']} tracking row(s)")
+    po_query = st.text_area("PO numbers (one per line, or pasted from Excel)", height=100)
+    lk1, lk2 = st.columns(2)
+    if lk1.button("Lookup", use_container_width=True) and po_query:
+        import pandas as pd
+        wanted = parse_po_list(po_query)
+        found = pd.DataFrame(po_index.lookup(wanted), columns=LOOKUP_COLUMNS)
+        missing = sorted(set(wanted) - set(found["PO"]))
+        if not found.empty: st.dataframe(found)
+        if missing: st.warning(f"Not in index: {', '.join(missing)}")
+    if lk2.button("Export Full Index", use_container_width=True):
+        import pandas as pd
+        index_df = pd.DataFrame(po_index.export_rows(), columns=EXPORT_COLUMNS)
+        def write_index(output):
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                index_df.to_excel(writer, index=False)
+        export = keep_latest(st.session_state, 'po_index_export', spool_writer(write_index, "Tracking_Index.xlsx"))
+        st.download_button("Download Tracking_Index.xlsx", export.read, export.file_name, mime=XLSX_MIME, use_container_width=True, on_click="ignore")
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import threading
+import time
+
+# --- AYARLAR ---
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024   # Bu boyutu aşan çıktı RAM'den diske taşınır
+SPOOL_TTL_SECONDS = 30 * 60          # İndirilmeyen çıktılar bu süreden sonra silinir
+JANITOR_INTERVAL = 60
+
+_live_exports = []
+_registry_lock = threading.Lock()
+_janitor = None
+
+
+class SpooledExport:
+    def __init__(self, file_name, max_memory=SPOOL_MAX_MEMORY, ttl=SPOOL_TTL_SECONDS):
+        self.file_name = file_name
+        self.ttl = ttl
+        self.size = 0
+        self.closed = False
+        self.expires_at = time.monotonic() + ttl
+        self._lock = threading.Lock()
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory, mode='w+b', prefix='asir_', suffix=os.path.splitext(file_name)[1])
+
+    @property
+    def on_disk(self):
+        return bool(getattr(self.file, '_rolled', False))
+
+    def seal(self):
+        self.file.flush()
+        self.size = self.file.tell()
+        self.file.seek(0)
+        self.touch()  # Süre yazım bittiğinde başlar; uzun süren yazım çıktının ömründen yemez
+        return self
+
+    def touch(self):
+        self.expires_at = time.monotonic() + self.ttl
+
+    def expired(self, now=None):
+        return (now or time.monotonic()) >= self.expires_at
+
+    def read(self):
+        # st.download_button(data=export.read) -> byte'lar sadece indirme anında okunur
+        with self._lock:
+            if self.closed:
+                raise FileNotFoundError(f"{self.file_name} expired, please generate it again.")
+            self.touch()
+            self.file.seek(0)
+            return self.file.read()
+
+    def close(self):
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self.file.close()
+
+
+def _register(export):
+    global _janitor
+    with _registry_lock:
+        _live_exports.append(export)
+        if _janitor is None or not _janitor.is_alive():
+            _janitor = threading.Thread(target=_janitor_loop, name="export-spool-janitor", daemon=True)
+            _janitor.start()
+    purge_expired_exports()
+    return export
+
+
+def _janitor_loop():
+    while True:
+        time.sleep(JANITOR_INTERVAL)
+        purge_expired_exports()
+
+
+def purge_expired_exports():
+    now = time.monotonic()
+    with _registry_lock:
+        expired = [e for e in _live_exports if e.closed or e.expired(now)]
+        _live_exports[:] = [e for e in _live_exports if e not in expired]
+    for e in expired: e.close()
+    return len(expired)
+
+
+def spool_stats():
+    with _registry_lock:
+        live = [e for e in _live_exports if not e.closed]
+    return {'exports': len(live), 'bytes': sum(e.size for e in live), 'on_disk': sum(1 for e in live if e.on_disk)}
+
+
+def spool_workbook(wb, file_name):
+    return spool_writer(wb.save, file_name)
+
+
+def spool_writer(write_fn, file_name):
+    # write_fn(fileobj): pd.ExcelWriter gibi dosya nesnesine yazan herhangi bir fonksiyon
+    export = SpooledExport(file_name)
+    try:
+        write_fn(export.file)
+    except Exception:
+        export.close()
+        raise
+    return _register(export.seal())
+
+
+def keep_latest(state, slot, export):
+    # Aynı oturumda yeniden üretilen çıktı, bir öncekini hemen serbest bırakır
+    previous = state.get(slot)
+    if previous is not None and previous is not export: previous.close()
+    state[slot] = export
+    return export
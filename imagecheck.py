@@ -0,0 +1,197 @@
+import asyncio
+import http.client
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from urllib.parse import urljoin, urlsplit
+
+# --- AYARLAR ---
+DEFAULT_CACHE_PATH = os.environ.get("ASIR_IMAGE_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_check.sqlite3"))
+REQUEST_TIMEOUT = float(os.environ.get("ASIR_IMAGE_CHECK_TIMEOUT", "10"))
+PER_HOST_LIMIT = 6          # Aynı CDN'e aynı anda açık istek (ve keep-alive bağlantı) sayısı
+TOTAL_LIMIT = 48
+OK_TTL_SECONDS = 7 * 24 * 3600
+FAILED_TTL_SECONDS = 3600   # Hatalı sonuçlar geçici olabilir; daha kısa sürede yeniden denenir
+MAX_REDIRECTS = 5
+CACHE_CHUNK = 500
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+IMAGE_TYPES = ("image/", "application/octet-stream", "binary/octet-stream")
+HOST_DOWN = "host unreachable"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS url_checks (
+    url TEXT PRIMARY KEY,
+    ok INTEGER NOT NULL,
+    detail TEXT NOT NULL,
+    checked_at REAL NOT NULL
+);
+"""
+
+
+def normalize_url(url):
+    # Data Excel'inde "www." ile başlayan linkler de var
+    return url if url.lower().startswith(("http://", "https://")) else "http://" + url
+
+
+class UrlCheckCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_many(self, urls, now=None):
+        now = now or time.time()
+        found = {}
+        with closing(self._connect()) as con:
+            for i in range(0, len(urls), CACHE_CHUNK):
+                chunk = urls[i:i + CACHE_CHUNK]
+                rows = con.execute(f"SELECT url, ok, detail, checked_at FROM url_checks WHERE url IN ({', '.join('?' * len(chunk))})", chunk)
+                for url, ok, detail, checked_at in rows:
+                    if now - checked_at < (OK_TTL_SECONDS if ok else FAILED_TTL_SECONDS): found[url] = (bool(ok), detail)
+        return found
+
+    def put_many(self, results, now=None):
+        now = now or time.time()
+        with closing(self._connect()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO url_checks (url, ok, detail, checked_at) VALUES (?, ?, ?, ?)",
+                            ((url, int(ok), detail, now) for url, (ok, detail) in results.items()))
+
+
+class PooledFetcher:
+    # fetch(method, url) -> (status, content-type, location); host başına keep-alive bağlantılar yeniden kullanılır
+    def __init__(self, timeout=REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme, netloc):
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle: return idle.pop(), True
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout), False
+
+    def _release(self, key, conn):
+        with self._lock: self._idle.setdefault(key, []).append(conn)
+
+    def __call__(self, method, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = {"User-Agent": "AsirTools-ImageCheck/1.0"}
+        if method == "GET": headers["Range"] = "bytes=0-0"
+        while True:
+            conn, reused = self._connection(*key)
+            try:
+                conn.request(method, target, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused: continue  # Sunucunun kapattığı boşta bağlantı; yenisiyle bir kez daha
+                raise
+            except Exception:
+                conn.close()
+                raise
+            result = resp.status, resp.getheader("Content-Type", ""), resp.getheader("Location")
+            # HEAD gövdesizdir, bağlantı havuza döner; GET'te Range yok sayılmış olabilir, gövde okunmaz
+            if method == "HEAD" and not resp.will_close:
+                resp.read()
+                self._release(key, conn)
+            else:
+                conn.close()
+            return result
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns: conn.close()
+            self._idle.clear()
+
+
+def check_url(url, fetch):
+    target = normalize_url(url)
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            status, ctype, location = fetch("HEAD", target)
+            # Bazı CDN'ler HEAD'i reddeder; tek byte'lık GET ile tekrar denenir
+            if status in (403, 405, 501): status, ctype, location = fetch("GET", target)
+            if status in REDIRECT_CODES and location:
+                target = urljoin(target, location)
+                continue
+            break
+        else:
+            return False, "too many redirects"
+    except (socket.gaierror, ConnectionRefusedError) as e:
+        return False, f"{HOST_DOWN}: {e}"
+    except TimeoutError:
+        return False, "timeout"
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+    if not 200 <= status < 300: return False, f"HTTP {status}"
+    if ctype and not ctype.lower().startswith(IMAGE_TYPES): return False, f"not an image ({ctype.split(';')[0].strip()})"
+    return True, f"HTTP {status}"
+
+
+class ImageUrlChecker:
+    # fetch enjekte edilebilir (yerel stub sunucu veya sahte fonksiyon ile test için); cache_path=None önbelleği kapatır
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, fetch=None, per_host=PER_HOST_LIMIT, total=TOTAL_LIMIT, timeout=REQUEST_TIMEOUT):
+        self.cache = UrlCheckCache(cache_path) if cache_path else None
+        self.fetch = fetch
+        self.per_host = per_host
+        self.total = total
+        self.timeout = timeout
+        self.last_stats = {}
+
+    def verify(self, urls):
+        urls = list(dict.fromkeys(u for u in urls if u))
+        started = time.monotonic()
+        cached = self.cache.get_many(urls) if self.cache else {}
+        todo = [u for u in urls if u not in cached]
+        fresh, unchecked = asyncio.run(self._check_all(todo)) if todo else ({}, set())
+        # Ölü host kısayolundan gelen sonuçlar denenmedi; önbelleğe yazılmaz, bir sonraki doğrulamada gerçekten denenir
+        if self.cache and fresh: self.cache.put_many({u: r for u, r in fresh.items() if u not in unchecked})
+        results = {**cached, **fresh}
+        self.last_stats = {'urls': len(urls), 'cached': len(cached), 'checked': len(fresh),
+                           'broken': sum(1 for ok, _ in results.values() if not ok), 'seconds': round(time.monotonic() - started, 2)}
+        return results
+
+    async def _check_all(self, urls):
+        loop = asyncio.get_running_loop()
+        fetch = self.fetch or PooledFetcher(self.timeout)
+        total = asyncio.Semaphore(self.total)
+        per_host, dead_hosts, unchecked = {}, {}, set()
+        executor = ThreadPoolExecutor(max_workers=self.total, thread_name_prefix="image-check")
+
+        async def one(url):
+            host = urlsplit(normalize_url(url)).netloc.lower()
+            host_limit = per_host.setdefault(host, asyncio.Semaphore(self.per_host))
+            async with total, host_limit:
+                # Çözülemeyen/bağlantı reddeden host'un kalan linkleri tek tek denenmez
+                if host in dead_hosts:
+                    unchecked.add(url)
+                    return url, dead_hosts[host]
+                try:
+                    # DNS çözümlemesi soket zaman aşımına tabi değil; toplam süre ayrıca sınırlanır
+                    result = await asyncio.wait_for(loop.run_in_executor(executor, check_url, url, fetch), self.timeout * (MAX_REDIRECTS + 1))
+                except asyncio.TimeoutError:
+                    # Tek bir yavaş/damla damla gelen yanıt da buraya düşer; host'un geri kalanı yine denenir
+                    result = (False, "timeout")
+                # Host sadece check_url çözümleme/bağlantı reddi bildirdiyse ölü sayılır
+                if result[1].startswith(HOST_DOWN): dead_hosts.setdefault(host, result)
+                return url, result
+
+        try:
+            return dict(await asyncio.gather(*(one(u) for u in urls))), unchecked
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if fetch is not self.fetch:
+                # Takılı kalan istekler fetch'i kullanmaya devam eder; bağlantılar onlar bittikten sonra kapatılır
+                threading.Thread(target=lambda: (executor.shutdown(wait=True), fetch.close()), name="image-check-close", daemon=True).start()
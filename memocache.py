@@ -0,0 +1,149 @@
+import functools
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# --- AYARLAR ---
+TEXT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+SHARED_CACHE_MAX_BYTES = int(os.environ.get("ASIR_SHARED_CACHE_MB", "512")) * 1024 * 1024
+
+_MISSING = object()
+
+
+def approx_size(obj):
+    # DataFrame/Series: pandas'ın kendi derin bellek ölçümü
+    if hasattr(obj, 'memory_usage') and hasattr(obj, 'index'):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    # Dizi tabanlı yapılar (numpy dizileri, koli deposu) kendi boyutunu bildirir
+    if hasattr(obj, 'nbytes'): return int(obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(v) for v in obj)
+    return size
+
+
+class ByteBudgetLRU:
+    def __init__(self, max_bytes, name=""):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._journal = None  # start_journal() sonrası eklenen kayıtlar; iş süreçleri bunları ebeveyne geri yollar
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        if size is None: size = approx_size(key) + approx_size(value)
+        # Bütçeden büyük tek bir değer diğer her şeyi silmesin diye hiç saklanmaz
+        if size > self.max_bytes: return value
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None: self.resident_bytes -= old[1]
+            self._data[key] = (value, size)
+            self.resident_bytes += size
+            if self._journal is not None: self._journal.append((key, value, size))
+            while self.resident_bytes > self.max_bytes and self._data:
+                _, (_, ev_size) = self._data.popitem(last=False)
+                self.resident_bytes -= ev_size
+                self.evictions += 1
+        return value
+
+    def get_or_build(self, key, build, size=None):
+        hit = self.get(key, _MISSING)
+        if hit is not _MISSING: return hit
+        return self.put(key, build(), size)
+
+    def start_journal(self):
+        # Sayaçlar da sıfırlanır: fork ile gelen ebeveyn sayaçları geri yollanınca iki kez sayılmasın
+        with self._lock:
+            self._journal = []
+            self.hits = self.misses = 0
+
+    def drain_journal(self):
+        # Son çağrıdan beri eklenen kayıtlar ve sayaçlar; fork'lanan süreçteki önbellek kopyası havuzla birlikte atılır
+        with self._lock:
+            entries, self._journal = self._journal or [], []
+            counters, self.hits, self.misses = (self.hits, self.misses), 0, 0
+        return entries, counters
+
+    def merge(self, entries, counters=(0, 0)):
+        for key, value, size in entries: self.put(key, value, size)
+        with self._lock:
+            self.hits += counters[0]
+            self.misses += counters[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.resident_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name, 'entries': len(self._data), 'resident_bytes': self.resident_bytes,
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+def file_digest(fileobj):
+    # Yüklenen dosyanın içerik özeti; aynı dosyayı yükleyen tüm oturumlar aynı anahtarı alır
+    fileobj.seek(0)
+    digest = hashlib.file_digest(fileobj, lambda: hashlib.blake2b(digest_size=20)).hexdigest()
+    fileobj.seek(0)
+    return digest
+
+
+def text_key(prefix, *args, **kwargs):
+    raw = repr((prefix, args, sorted(kwargs.items()))).encode('utf-8', 'surrogatepass')
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def memoize_text(cache):
+    # Sadece saf metin fonksiyonları için: aynı girdi (metin + bölge bayrağı) her zaman aynı çıktıyı verir
+    def decorator(fn):
+        prefix = fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = text_key(prefix, *args, **kwargs)
+            hit = cache.get(key, _MISSING)
+            if hit is not _MISSING:
+                return dict(hit) if isinstance(hit, dict) else hit
+            value = fn(*args, **kwargs)
+            cache.put(key, value)
+            return dict(value) if isinstance(value, dict) else value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+# Streamlit her rerun'da script'i yeniden çalıştırır ama bu modül süreç boyunca bir kez yüklenir;
+# böylece önbellek tüm çalıştırmalar ve oturumlar arasında paylaşılır.
+TEXT_CACHE = ByteBudgetLRU(TEXT_CACHE_MAX_BYTES, name="text")
+
+# Yüklenen dosyalardan türetilen yapılar (DataFrame, şablon şeması, koli sözlüğü) içerik özetiyle paylaşılır;
+# toplam boyut SHARED_CACHE_MAX_BYTES ile sınırlı, en eski kullanılan kayıt önce atılır.
+SHARED_CACHE = ByteBudgetLRU(SHARED_CACHE_MAX_BYTES, name="shared")
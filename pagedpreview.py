@@ -0,0 +1,73 @@
+import math
+import re
+
+import streamlit as st
+
+# Büyük sonuç tablolarının önizlemesi: tarayıcıya sadece seçili sayfa gönderilir, filtre ve sayfalama sunucuda yapılır.
+# Tam veri sadece indirme dosyasında.
+# --- AYARLAR ---
+PAGE_SIZES = (25, 50, 100, 200)   # Tek sayfada en fazla max(PAGE_SIZES) satır gider
+DEFAULT_PAGE_SIZE = 50
+MAX_CELL_CHARS = 300              # Uzun açıklama/özellik hücreleri önizlemede kısaltılır
+
+LABELS = {
+    'en': {'filter': "🔎 Filter by {cols}", 'placeholder': "one value, or several separated by comma/space",
+           'page': "Page", 'size': "Rows / page", 'shown': "Rows {start:,}–{end:,} of {count:,}", 'filtered': " (filtered from {total:,})",
+           'empty': "No matching rows."},
+    'tr': {'filter': "🔎 {cols} ile filtrele", 'placeholder': "tek değer veya virgül/boşlukla ayrılmış liste",
+           'page': "Sayfa", 'size': "Satır / sayfa", 'shown': "{count:,} satırdan {start:,}–{end:,} arası", 'filtered': " ({total:,} satır içinden)",
+           'empty': "Eşleşen satır yok."},
+}
+
+
+def filter_rows(df, columns, query):
+    terms = [t for t in re.split(r"[\s,;]+", query.strip()) if t]
+    if not terms or not columns: return df
+    mask = None
+    for col in columns:
+        values = df[col].astype(str)
+        # Tek değer: içinde geçen satırlar; Excel'den yapıştırılan liste: birebir eşleşme (terim sayısından bağımsız tek geçiş)
+        if len(terms) == 1: hit = values.str.contains(terms[0], case=False, regex=False)
+        else: hit = values.str.strip().str.upper().isin({t.upper() for t in terms})
+        mask = hit if mask is None else mask | hit
+    return df[mask]
+
+
+def clip_cells(page_df, limit=MAX_CELL_CHARS):
+    from pandas.api.types import is_string_dtype
+    page_df = page_df.copy()
+    # Sütunlara konumla erişilir, isim tekrar etse bile doğru sütun kısaltılır
+    for i, dtype in enumerate(page_df.dtypes):
+        if is_string_dtype(dtype):
+            page_df.iloc[:, i] = page_df.iloc[:, i].map(lambda v: v[:limit] + "…" if isinstance(v, str) and len(v) > limit else v)
+    return page_df
+
+
+def _reset_page(page_key):
+    st.session_state[page_key] = 1
+
+
+@st.fragment
+def paged_preview(df, key, search_cols=(), lang='en'):
+    # Fragment: sayfa/filtre değişince sadece bu bölüm yeniden çalışır; butonla üretilen sonuçlar ekranda kalır
+    text = LABELS[lang]
+    cols = [c for c in search_cols if c in df.columns]
+    page_key = f"{key}_page"
+    f1, f2, f3 = st.columns([4, 1, 1])
+    query = f1.text_input(text['filter'].format(cols=" / ".join(cols)), key=f"{key}_filter", placeholder=text['placeholder'],
+                          on_change=_reset_page, args=(page_key,)) if cols else ""
+    view = filter_rows(df, cols, query)
+    size = f3.selectbox(text['size'], PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=f"{key}_size",
+                        on_change=_reset_page, args=(page_key,))
+    pages = max(1, math.ceil(len(view) / size))
+    # Yeni sonuç veya daralan filtre eski sayfa numarasını geçersiz bırakabilir
+    if st.session_state.get(page_key, 1) > pages: st.session_state[page_key] = pages
+    page = f2.number_input(text['page'], min_value=1, max_value=pages, step=1, key=page_key)
+
+    if view.empty:
+        st.info(text['empty'])
+        return
+    start = (page - 1) * size
+    st.dataframe(clip_cells(view.iloc[start:start + size]), width='stretch')
+    shown = text['shown'].format(start=start + 1, end=min(start + size, len(view)), count=len(view))
+    st.caption(shown + (text['filtered'].format(total=len(df)) if len(view) != len(df) else ""))
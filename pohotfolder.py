@@ -0,0 +1,196 @@
+import argparse
+import io
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from poindex import PoIndex, DEFAULT_INDEX_PATH
+from potracking import process_pdfs_robust
+
+# Gözetimsiz PO Tracking: gelen kutusuna düşen etiket PDF'leri taranır, sonuçlar günlük takip listesine eklenir,
+# dosyalar arşive taşınır.  Kullanım: python pohotfolder.py --inbox /srv/labels/inbox
+# --- AYARLAR ---
+POLL_SECONDS = 1.0
+DEBOUNCE_SECONDS = 2.0   # Boyutu/zamanı bu süre boyunca değişmeyen dosya "yazımı bitti" sayılır
+MAX_BATCH_FILES = 50
+MAX_BATCH_ATTEMPTS = 3   # Partisi bu kadar kez üst üste çöken dosya failed/ klasörüne alınır
+IGNORED_PREFIXES = (".", "~$")
+IGNORED_SUFFIXES = (".part", ".tmp", ".crdownload")
+
+log = logging.getLogger("pohotfolder")
+
+
+def daily_list_path(out_dir, day=None):
+    # PO Tracking sayfasındaki indirme ile aynı isim: 19-10-2026_Tracking_List.xlsx
+    return os.path.join(out_dir, f"{(day or datetime.now()).strftime('%d-%m-%Y')}_Tracking_List.xlsx")
+
+
+class DailyTrackingList:
+    # Gün boyunca biriken PO -> {TRK} listesi; her partiden sonra Excel dosyası atomik olarak yeniden yazılır
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.path = None
+        self.rows = {}
+
+    def _roll(self):
+        path = daily_list_path(self.out_dir)
+        if path == self.path: return
+        self.path, self.rows = path, {}
+        if os.path.exists(path):
+            # Servis gün içinde yeniden başlatıldıysa mevcut liste kaldığı yerden devam eder
+            for po, trk in pd.read_excel(path, dtype=str).fillna("").itertuples(index=False):
+                self.rows.setdefault(po, set()).update(t.strip() for t in trk.split(",") if t.strip())
+
+    def add(self, results_df):
+        self._roll()
+        rows = {po: set(trks) for po, trks in self.rows.items()}
+        added = 0
+        for po, trk in results_df[["PO", "TRK"]].itertuples(index=False):
+            known = rows.setdefault(po, set())
+            new = {t.strip() for t in trk.split(",") if t.strip()} - known
+            known.update(new)
+            added += len(new)
+        # Dosya yazılamazsa bellekteki liste de değişmez; parti tekrar denendiğinde aynı satırlar yeniden eklenir
+        if added: self._write(rows)
+        self.rows = rows
+        return added
+
+    def _write(self, rows):
+        df = pd.DataFrame([{"PO": po, "TRK": ", ".join(sorted(trks))} for po, trks in sorted(rows.items()) if trks])
+        tmp = os.path.join(self.out_dir, f".~{os.path.basename(self.path)}")
+        with pd.ExcelWriter(tmp, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False)
+        os.replace(tmp, self.path)
+
+
+class InboxWatcher:
+    def __init__(self, inbox, archive, failed):
+        self.inbox, self.archive, self.failed = inbox, archive, failed
+        self._seen = {}   # yol -> (boyut, mtime, değişmeden beri geçen sürenin başlangıcı)
+        self._failures = {}   # yol -> çöken parti sayısı
+        self._given_up = set()   # failed/ klasörüne bile taşınamayan dosyalar; süreç boyunca bir daha denenmez
+
+    def settled_files(self):
+        now = time.monotonic()
+        current = {}
+        with os.scandir(self.inbox) as it:
+            for entry in it:
+                name = entry.name
+                if not entry.is_file() or name.startswith(IGNORED_PREFIXES) or name.lower().endswith(IGNORED_SUFFIXES): continue
+                if not name.lower().endswith(".pdf") or entry.path in self._given_up: continue
+                st = entry.stat()
+                sig = (st.st_size, st.st_mtime_ns)
+                prev = self._seen.get(entry.path)
+                current[entry.path] = (*sig, prev[2] if prev and prev[:2] == sig else now)
+        self._seen = current
+        settled = [p for p, (_, _, since) in current.items() if now - since >= DEBOUNCE_SECONDS]
+        for path in [p for p in settled if current[p][0] == 0]:
+            # Boş kalmış PDF hiç işlenemez; gelen kutusunda bekletilirse --once hiç bitmez
+            log.warning("%s: empty file, moved to %s", os.path.basename(path), self.failed)
+            self.move(path, failed=True)
+        ready = [p for p in settled if p in self._seen]
+        return sorted(ready, key=lambda p: current[p][1])[:MAX_BATCH_FILES]
+
+    def move(self, path, failed=False):
+        base = self.failed if failed else os.path.join(self.archive, datetime.now().strftime("%Y-%m-%d"))
+        os.makedirs(base, exist_ok=True)
+        target = os.path.join(base, os.path.basename(path))
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(target)
+            target = f"{stem}_{datetime.now().strftime('%H%M%S%f')}{ext}"
+        shutil.move(path, target)
+        self._seen.pop(path, None)
+        self._failures.pop(path, None)
+        return target
+
+    def batch_failed(self, paths):
+        # Her çöküşte dosya başına sayaç artar; sınırı aşan dosya sonsuza dek yeniden denenmez
+        for path in paths:
+            if not os.path.exists(path): continue   # Parti çökmeden önce taşınmış
+            self._failures[path] = self._failures.get(path, 0) + 1
+            if self._failures[path] < MAX_BATCH_ATTEMPTS: continue
+            try: target = self.move(path, failed=True)
+            except OSError as e:
+                log.error("%s: failed %d times and could not be moved (%s); ignored until restart", os.path.basename(path), self._failures[path], e)
+                self._given_up.add(path)
+                self._seen.pop(path, None)
+            else:
+                log.error("%s: failed %d times, moved to %s", os.path.basename(path), MAX_BATCH_ATTEMPTS, target)
+
+    @property
+    def pending(self):
+        return bool(self._seen)
+
+
+def load_batch(paths):
+    files = []
+    for path in paths:
+        with open(path, "rb") as f: buf = io.BytesIO(f.read())
+        buf.name = os.path.basename(path)
+        files.append(buf)
+    return files
+
+
+def process_batch(paths, watcher, tracking_list, index):
+    failed = set()
+
+    def report_error(file_name, message):
+        failed.add(file_name)
+        log.error("%s: %s", file_name, message)
+
+    started = time.monotonic()
+    stats = {}
+    results_df = process_pdfs_robust(load_batch(paths), stats=stats, index=index, report_error=report_error)
+    for t in stats["timeouts"]:
+        failed.add(t["File"])
+        log.warning("%s: page %s timed out, check it by hand", t["File"], t["Page"])
+    added = tracking_list.add(results_df) if not results_df.empty else 0
+    for path in paths:
+        watcher.move(path, failed=os.path.basename(path) in failed)
+    log.info("%d file(s): %d page(s) scanned, %d from index, %d new tracking number(s) -> %s (%.1fs)",
+             len(paths), stats["scanned"], stats["from_index"], added, tracking_list.path or "-", time.monotonic() - started)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Watch an inbox folder for carrier label PDFs and keep a daily PO tracking list.")
+    parser.add_argument("--inbox", required=True)
+    parser.add_argument("--archive", help="default: <inbox>/archive")
+    parser.add_argument("--failed", help="files with errors or timed-out pages; default: <inbox>/failed")
+    parser.add_argument("--out", help="folder for the daily tracking list; default: <inbox>/tracking")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="tracking index (SQLite) shared with the PO Tracking Tool")
+    parser.add_argument("--once", action="store_true", help="process the files already in the inbox and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    out_dir = args.out or os.path.join(args.inbox, "tracking")
+    os.makedirs(out_dir, exist_ok=True)
+    watcher = InboxWatcher(args.inbox, args.archive or os.path.join(args.inbox, "archive"), args.failed or os.path.join(args.inbox, "failed"))
+    tracking_list = DailyTrackingList(out_dir)
+    index = PoIndex(args.index)
+    log.info("watching %s", args.inbox)
+
+    while True:
+        ready = watcher.settled_files()
+        if args.once and not ready and not watcher.pending: return 0
+        if ready:
+            try: process_batch(ready, watcher, tracking_list, index)
+            except Exception:
+                if args.once:
+                    # Tek seferlik çalıştırmada aynı partiyi tekrar denemek çıkışı sonsuza dek erteler
+                    log.exception("batch failed; files stay in the inbox")
+                    return 1
+                log.exception("batch failed; files stay in the inbox and will be retried")
+                watcher.batch_failed(ready)
+                time.sleep(DEBOUNCE_SECONDS)
+        else:
+            time.sleep(POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    try: sys.exit(main(sys.argv[1:]))
+    except KeyboardInterrupt: pass
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import re
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+# --- AYARLAR ---
+DEFAULT_INDEX_PATH = os.environ.get("ASIR_PO_INDEX", os.path.join(os.path.dirname(os.path.abspath(__file__)), "po_index.sqlite3"))
+LOOKUP_CHUNK = 500   # SQLite parametre limitinin altında kalmak için IN (...) sorgularını böleriz
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_hash TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sightings (
+    po TEXT NOT NULL,
+    trk TEXT NOT NULL,
+    file_hash TEXT NOT NULL REFERENCES files(file_hash),
+    page INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    PRIMARY KEY (po, trk, file_hash, page)
+);
+CREATE INDEX IF NOT EXISTS ix_sightings_trk ON sightings (trk);
+CREATE INDEX IF NOT EXISTS ix_sightings_file ON sightings (file_hash);
+"""
+
+LOOKUP_SQL = """
+SELECT s.po, s.trk, MIN(s.first_seen) AS first_seen, COUNT(*) AS sightings,
+       GROUP_CONCAT(DISTINCT f.file_name) AS files
+FROM sightings s JOIN files f ON f.file_hash = s.file_hash
+WHERE s.po IN ({marks})
+GROUP BY s.po, s.trk
+ORDER BY s.po, s.trk
+"""
+
+
+def file_sha256(fileobj):
+    fileobj.seek(0)
+    digest = hashlib.file_digest(fileobj, "sha256").hexdigest()
+    fileobj.seek(0)
+    return digest
+
+
+class PoIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+
+    def _connect(self):
+        # Streamlit oturumları farklı thread'lerde çalışır; her işlem kendi bağlantısını açar
+        return sqlite3.connect(self.path, timeout=30)
+
+    def has_file(self, file_hash):
+        with closing(self._connect()) as con:
+            return con.execute("SELECT 1 FROM files WHERE file_hash = ?", (file_hash,)).fetchone() is not None
+
+    def ingest(self, file_name, file_hash, page_pairs, pages):
+        # page_pairs: [(page_no, po, trk), ...]; aynı dosya tekrar gelirse hiçbir şey yazılmaz
+        now = datetime.now().isoformat(timespec="seconds")
+        with closing(self._connect()) as con, con:
+            cur = con.execute("INSERT OR IGNORE INTO files (file_hash, file_name, pages, indexed_at) VALUES (?, ?, ?, ?)",
+                              (file_hash, file_name, pages, now))
+            if cur.rowcount == 0: return 0
+            cur = con.executemany("INSERT OR IGNORE INTO sightings (po, trk, file_hash, page, first_seen) VALUES (?, ?, ?, ?, ?)",
+                                  ((po, trk, file_hash, page_no, now) for page_no, po, trk in page_pairs))
+            return cur.rowcount
+
+    def pairs_for_file(self, file_hash):
+        with closing(self._connect()) as con:
+            return con.execute("SELECT page, po, trk FROM sightings WHERE file_hash = ? ORDER BY page", (file_hash,)).fetchall()
+
+    def lookup(self, pos):
+        pos = list(dict.fromkeys(p.strip().upper() for p in pos if p and p.strip()))
+        rows = []
+        with closing(self._connect()) as con:
+            for i in range(0, len(pos), LOOKUP_CHUNK):
+                chunk = pos[i:i + LOOKUP_CHUNK]
+                rows.extend(con.execute(LOOKUP_SQL.format(marks=", ".join("?" * len(chunk))), chunk).fetchall())
+        rows.sort()
+        return rows
+
+    def export_rows(self):
+        with closing(self._connect()) as con:
+            return con.execute(
+                "SELECT s.po, s.trk, s.page, f.file_name, s.file_hash, s.first_seen "
+                "FROM sightings s JOIN files f ON f.file_hash = s.file_hash ORDER BY s.po, s.trk, s.first_seen"
+            ).fetchall()
+
+    def stats(self):
+        with closing(self._connect()) as con:
+            files = con.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            pos, rows = con.execute("SELECT COUNT(DISTINCT po), COUNT(*) FROM sightings").fetchone()
+        return {'files': files, 'pos': pos, 'rows': rows}
+
+
+LOOKUP_COLUMNS = ["PO", "TRK", "First Seen", "Sightings", "Files"]
+EXPORT_COLUMNS = ["PO", "TRK", "Page", "File", "File Hash", "First Seen"]
+
+
+def parse_po_list(text):
+    return re.findall(r"(?:CS|CA)\d{9,}", str(text or "").upper())
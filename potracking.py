@@ -0,0 +1,287 @@
+import io
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+import pandas as pd
+import pypdf
+import re
+from poindex import file_sha256
+from procpool import fork_context, default_workers
+
+# --- HELPER FUNCTIONS (PO TRACKING TOOL - ROBUST VERSION) ---
+PO_MARKERS = ("CS", "CA")
+# Tek geçişli birleşik tarayıcı: PO eşleşmesi o andaki "aktif PO"yu değiştirir, tracking eşleşmesi ona yazılır.
+# Gelişmiş Tracking Regex: 00 ile başlayan 18-20 hane veya 12-15 haneli numaraları yakalar
+# Barkodlardan kaçınmak için etrafında harf/rakam olmayan izole sayıları arar
+# (Bir sonraki PO'nun hemen önünde biten numaralar da eski split mantığındaki gibi kabul edilir)
+PO_TRK_SCANNER = re.compile(r"(?P<po>(?:CS|CA)\d{9,})|(?<![a-zA-Z0-9])(?P<trk>\d{12,20})(?=(?:CS|CA)\d{9}|[^a-zA-Z0-9]|$)")
+
+def page_has_text_layer(page):
+    # Font kaynağı olmayan sayfalar (taranmış kapak, sadece görsel) metin içeremez; extract_text'e hiç girmeyiz
+    try:
+        resources = page.get("/Resources")
+        if resources is None: return True
+        resources = resources.get_object()
+        if "/Font" in resources: return True
+        xobjects = resources.get("/XObject")
+        if xobjects is None: return False
+        xobjects = xobjects.get_object()
+        return any(xobjects[name].get_object().get("/Subtype") == "/Form" for name in xobjects)
+    except Exception:
+        return True
+
+def scan_po_text(text):
+    pairs = []
+    if not text or not any(m in text for m in PO_MARKERS): return pairs
+    current_po = None
+    for m in PO_TRK_SCANNER.finditer(text):
+        if m.lastgroup == "po": current_po = m.group("po")
+        elif current_po is not None:
+            t = m.group("trk")
+            # 26 ile başlayan dikey statik kodları eliyoruz
+            if not t.startswith("26"): pairs.append((current_po, t))
+    return pairs
+
+def scan_page(page):
+    # None: sayfada PO işareti yok (atlandı); liste: sayfadaki (PO, TRK) çiftleri
+    if not page_has_text_layer(page): return None
+    text = page.extract_text()
+    if not text or not any(m in text for m in PO_MARKERS): return None
+    return scan_po_text(text)
+
+def record_page(job, stats, page_no, pairs):
+    if pairs is None:
+        stats["skipped"] += 1
+        return
+    stats["scanned"] += 1
+    job["pairs"].extend((page_no, po_number, trk) for po_number, trk in pairs)
+
+# --- SAYFA BÜTÇESİ VE PARÇALI TARAMA ---
+# Bozuk/görsel ağırlıklı bir sayfada extract_text dakikalarca dönebilir. Sayfalar ayrı süreçlerde, dosya başına
+# SHARD_PAGES'lik parçalar halinde taranır; PAGE_TIMEOUT_SECONDS'u aşan sayfanın süreci öldürülür, sayfa raporlanır
+# ve parça bir sonraki sayfadan yeni bir süreçle devam eder. PDF'in açılması ve sayfa sayımı da aynı bütçeyle
+# dosyanın ilk parçasında yapılır; kalan parçalar sayfa sayısı gelince kuyruğa eklenir.
+PAGE_TIMEOUT_SECONDS = float(os.environ.get("ASIR_PDF_PAGE_TIMEOUT", "20"))
+SHARD_PAGES = 50
+MAX_PDF_WORKERS = int(os.environ.get("ASIR_PDF_WORKERS", "4"))
+
+def _shard_worker(data, first, last, conn):
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        pages = len(reader.pages)
+        conn.send(("pages", pages))
+        for page_no in range(first, min(last, pages) + 1):
+            conn.send(("start", page_no))
+            try: conn.send(("page", page_no, scan_page(reader.pages[page_no - 1])))
+            except Exception as e: conn.send(("error", page_no, str(e)))
+        conn.send(("done", None))
+    except Exception as e:
+        conn.send(("error", None, str(e)))
+        conn.send(("done", None))
+    finally:
+        conn.close()
+
+class _Shard:
+    def __init__(self, job, first, last):
+        self.job, self.first, self.last = job, first, last
+        self.page = None              # Şu an taranan sayfa
+        self.done = first - 1         # Sonucu alınmış son sayfa
+        self.started = None
+        self.proc = self.conn = None
+
+    def start(self, mp_ctx):
+        self.conn, child_conn = mp_ctx.Pipe(duplex=False)
+        # fork: PDF byte'ları kopyalanmadan (pickle'sız) çocuğa geçer
+        self.proc = mp_ctx.Process(target=_shard_worker, args=(self.job["data"], self.first, self.last, child_conn), daemon=True)
+        self.proc.start()
+        child_conn.close()
+        # Süre süreç başlar başlamaz işler; PdfReader açılışta takılırsa da bütçe uygulanır
+        self.started = time.monotonic()
+
+    def stop(self, kill=False):
+        if kill: self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def lost_page(self):
+        # Yarıda kalan sayfa; sayfa arasında kaldıysa tamamlanan son sayfanın bir sonrakinden devam edilir
+        return self.page if self.page is not None else self.done + 1
+
+def _abandon_shard(shard, pending, message):
+    # Açılış (sayfa sayısı) bile bitmediyse dosya okunamıyor demektir; yeniden denenmez
+    if shard.job["pages"] is None:
+        shard.job["errors"].append(message)
+        return None
+    page_no = shard.lost_page()
+    if page_no < shard.last: pending.appendleft(_Shard(shard.job, page_no + 1, shard.last))
+    return page_no
+
+def scan_jobs_sharded(jobs, stats, workers=None):
+    mp_ctx = fork_context()
+    workers = workers or default_workers(MAX_PDF_WORKERS)
+    pending = deque(_Shard(job, 1, SHARD_PAGES) for job in jobs)
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            shard = pending.popleft()
+            shard.start(mp_ctx)
+            running[shard.conn] = shard
+        for conn in wait(list(running), timeout=0.25):
+            shard = running[conn]
+            try: msg = conn.recv()
+            except EOFError:
+                # Süreç mesaj göndermeden öldü (bellek, segfault): o sayfa hatalı sayılır, parça sonraki sayfadan sürer
+                del running[conn]
+                shard.stop()
+                page_no = _abandon_shard(shard, pending, "worker exited unexpectedly while opening the PDF")
+                if page_no is not None: shard.job["errors"].append(f"page {page_no}: worker exited unexpectedly")
+                continue
+            if msg[0] == "pages":
+                shard.last = min(shard.last, msg[1])
+                if shard.job["pages"] is None:
+                    shard.job["pages"] = msg[1]
+                    stats["pages"] += msg[1]
+                    pending.extend(_Shard(shard.job, first, min(first + SHARD_PAGES - 1, msg[1]))
+                                   for first in range(shard.last + 1, msg[1] + 1, SHARD_PAGES))
+                shard.started = time.monotonic()
+            elif msg[0] == "start":
+                shard.page, shard.started = msg[1], time.monotonic()
+            elif msg[0] == "page":
+                record_page(shard.job, stats, msg[1], msg[2])
+                shard.page, shard.done = None, msg[1]
+            elif msg[0] == "error":
+                shard.job["errors"].append(msg[2] if msg[1] is None else f"page {msg[1]}: {msg[2]}")
+                if msg[1] is not None: shard.page, shard.done = None, msg[1]
+            elif msg[0] == "done":
+                del running[conn]
+                shard.stop()
+        now = time.monotonic()
+        for conn, shard in list(running.items()):
+            if now - shard.started > PAGE_TIMEOUT_SECONDS:
+                del running[conn]
+                shard.stop(kill=True)
+                page_no = _abandon_shard(shard, pending, f"timed out opening the PDF ({PAGE_TIMEOUT_SECONDS:g}s)")
+                if page_no is not None:
+                    shard.job["timeouts"].append(page_no)
+                    stats["timed_out"] += 1
+
+def scan_job_inline(job, stats):
+    # fork olmayan platformlar: eski seri tarama (sayfa bütçesi uygulanamaz)
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(job["data"]))
+        job["pages"] = len(reader.pages)
+        stats["pages"] += job["pages"]
+        for page_no, page in enumerate(reader.pages, 1):
+            record_page(job, stats, page_no, scan_page(page))
+    except Exception as e:
+        job["errors"].append(str(e))
+
+def show_error(file_name, message):
+    import streamlit as st
+    st.error(f"Error: {file_name} - {message}")
+
+def process_pdfs_robust(pdf_files, stats=None, index=None, report_error=show_error):
+    # report_error(dosya adı, mesaj): Streamlit dışında (pohotfolder.py) hatalar log'a yazılır
+    all_data = {}
+    if stats is None: stats = {}
+    for key in ("pages", "scanned", "skipped", "from_index", "timed_out"): stats.setdefault(key, 0)
+    stats.setdefault("timeouts", [])
+
+    jobs = []
+    for pdf_file in pdf_files:
+        try:
+            file_hash = file_sha256(pdf_file) if index is not None else None
+            if index is not None and index.has_file(file_hash):
+                # Daha önce indekslenmiş dosya: PDF'i yeniden ayrıştırmadan sonuçları indeksten alıyoruz
+                stats["from_index"] += 1
+                for _, po_number, trk in index.pairs_for_file(file_hash):
+                    all_data.setdefault(po_number, set()).add(trk)
+                continue
+            pdf_file.seek(0)
+            data = pdf_file.read()
+            # Sayfa sayısı taramada (bütçeli süreçte) öğrenilir
+            jobs.append({"name": pdf_file.name, "hash": file_hash, "data": data, "pages": None, "pairs": [], "errors": [], "timeouts": []})
+        except Exception as e:
+            report_error(pdf_file.name, str(e))
+
+    if fork_context() is not None: scan_jobs_sharded(jobs, stats)
+    else:
+        for job in jobs: scan_job_inline(job, stats)
+
+    for job in jobs:
+        for _, po_number, trk in job["pairs"]:
+            all_data.setdefault(po_number, set()).add(trk)
+        if job["errors"]: report_error(job["name"], "; ".join(job["errors"][:3]))
+        stats["timeouts"].extend({"File": job["name"], "Page": p} for p in sorted(job["timeouts"]))
+        # Eksik taranan dosya indekse yazılmaz; bir sonraki çalıştırmada yeniden denenir
+        if index is not None and not job["errors"] and not job["timeouts"]:
+            index.ingest(job["name"], job["hash"], sorted(job["pairs"]), job["pages"])
+    
+    final_rows = []
+    for po in sorted(all_data.keys()):
+        trks = sorted(list(all_data[po]))
+        if trks:
+            final_rows.append({"PO": po, "TRK": ", ".join(trks)})
+    return pd.DataFrame(final_rows)
+
+# --- MASTER PO LIST JOIN ---
+# Lojistiğin açık PO listesi (on binlerce satır) sonuçlarla VLOOKUP yerine tek bir hash-join ile eşleştirilir.
+PO_VALUE_PATTERN = r"(?:CS|CA)\d{9,}"
+PO_COLUMN_SAMPLE_ROWS = 1000
+MASTER_STATUS_OK, MASTER_STATUS_MISSING, MASTER_STATUS_SHARED = "OK", "No tracking", "Shared tracking"
+MASTER_ADDED_COLUMNS = ["Tracking", "Tracking Count", "Tracking Status", "Shares Tracking With"]
+
+def read_master_po_list(master_file):
+    master_file.seek(0)
+    if master_file.name.lower().endswith(".csv"): return pd.read_csv(master_file, dtype=str, keep_default_na=False)
+    return pd.read_excel(master_file)
+
+def normalize_po_keys(values):
+    return values.astype(str).str.strip().str.upper().where(values.notna(), "")
+
+def find_po_column(master_df):
+    # PO sütunu başlığa göre değil içeriğe göre seçilir: örnekte en çok CS/CA PO numarası içeren sütun
+    best, best_hits = None, 0
+    sample = master_df.head(PO_COLUMN_SAMPLE_ROWS)
+    for col in sample.columns:
+        hits = int(normalize_po_keys(sample[col]).str.fullmatch(PO_VALUE_PATTERN).sum())
+        if hits > best_hits or (hits == best_hits and hits and "po" in str(col).lower()): best, best_hits = col, hits
+    if best is None: raise ValueError("No column with PO numbers (CS/CA...) found in the master list.")
+    return best
+
+def tracking_by_po(results_df):
+    # PO -> tracking bilgileri; aynı tracking numarası birden fazla PO'da geçiyorsa diğer PO'lar listelenir
+    per_po = pd.DataFrame({"Tracking": [], "Tracking Count": [], "Shares Tracking With": []}, index=pd.Index([], name="PO"))
+    if results_df.empty: return per_po
+    pairs = results_df[["PO", "TRK"]].assign(TRK=results_df["TRK"].str.split(", ")).explode("TRK")
+    shared = pairs.merge(pairs, on="TRK", suffixes=("", "_other"))
+    shared = shared[shared["PO"] != shared["PO_other"]].groupby("PO")["PO_other"].agg(lambda s: ", ".join(sorted(set(s))))
+    per_po = pd.DataFrame({"Tracking": results_df["TRK"].to_numpy(), "Tracking Count": (results_df["TRK"].str.count(", ") + 1).to_numpy()},
+                          index=pd.Index(results_df["PO"], name="PO"))
+    per_po["Shares Tracking With"] = shared.reindex(per_po.index).fillna("")
+    return per_po
+
+def join_master_po_list(master_df, results_df, po_col=None):
+    # Sonuç: (zenginleştirilmiş master, master'da olmayan çıkarılmış PO'lar, PO sütunu adı)
+    po_col = po_col or find_po_column(master_df)
+    per_po = tracking_by_po(results_df)
+    keys = normalize_po_keys(master_df[po_col])
+    # Tek hash-join: master satır sırası ve tekrar eden PO satırları korunur
+    joined = per_po.reindex(keys.to_numpy())
+    enriched = master_df.drop(columns=[c for c in MASTER_ADDED_COLUMNS if c in master_df.columns])
+    enriched["Tracking"] = joined["Tracking"].fillna("").to_numpy()
+    enriched["Tracking Count"] = joined["Tracking Count"].fillna(0).astype(int).to_numpy()
+    status = pd.Series(MASTER_STATUS_OK, index=enriched.index)
+    status[enriched["Tracking Count"].to_numpy() == 0] = MASTER_STATUS_MISSING
+    status[(joined["Shares Tracking With"].fillna("") != "").to_numpy()] = MASTER_STATUS_SHARED
+    enriched["Tracking Status"] = status
+    enriched["Shares Tracking With"] = joined["Shares Tracking With"].fillna("").to_numpy()
+    unmatched = per_po[pd.Index(keys.unique()).get_indexer(per_po.index) == -1].reset_index()
+    return enriched, unmatched, po_col
+
+def write_master_workbook(output, enriched, unmatched):
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        enriched.to_excel(writer, index=False, sheet_name="Open POs")
+        unmatched.to_excel(writer, index=False, sheet_name="Not In Master List")
@@ -0,0 +1,22 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Ağır işler (şablon satırları, PDF parçaları, toplu WF Template dönüşümü) için ortak süreç kurulumu.
+# Streamlit __main__'i kendi script'iyle değiştirir; spawn ile başlayan çocuk arayüzü yeniden çalıştırır.
+# Bu yüzden sadece fork kullanılır; fork olmayan platformda çağıran iş bu süreçte sırayla yapar.
+
+
+def fork_context():
+    return multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+
+
+def default_workers(limit):
+    return max(1, min(limit, os.cpu_count() or 1))
+
+
+def fork_pool(workers, **kwargs):
+    # None: fork yok ya da tek işçi yeter; çağıran iş kendi sürecinde yapar
+    mp_ctx = fork_context()
+    if mp_ctx is None or workers <= 1: return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=mp_ctx, **kwargs)
@@ -0,0 +1,135 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from memocache import file_digest
+
+# --- AYARLAR ---
+TEMPLATE_POOL_MAX = int(os.environ.get("ASIR_TEMPLATE_POOL", "4"))   # Sıcak tutulan farklı şablon sayısı
+SPARES_PER_TEMPLATE = 1                                              # Şablon başına hazırda bekleyen kopya
+TEMPLATE_POOL_MAX_BYTES = int(os.environ.get("ASIR_TEMPLATE_POOL_MB", "256")) * 1024 * 1024
+PARSED_CELL_BYTES = 400   # openpyxl'de hücre başına yaklaşık bellek (tracemalloc ile ölçüldü); sıkıştırılmış dosya boyutu yanıltır
+
+
+def workbook_size(wb):
+    return sum(len(ws._cells) for ws in wb.worksheets) * PARSED_CELL_BYTES
+
+
+class _PoolEntry:
+    def __init__(self, data):
+        self.data = data
+        self.spares = []
+        self.filling = False
+        self.parsed_bytes = 0    # Bir kopyanın tahmini boyutu; ilk parse'ta ölçülür
+        self.oversize = False    # Tek kopyası bile bütçeyi aşan şablon için yedek tutulmaz
+
+    def size(self):
+        return len(self.data) + len(self.spares) * self.parsed_bytes
+
+
+class TemplatePool:
+    # Aynı şablon gün içinde defalarca yüklenir; her içerik özeti için önceden parse edilmiş bir yedek workbook tutulur.
+    # Her çalıştırma yedeği kendine alır (workbook'lar paylaşılmaz), yerine arka planda yenisi parse edilir.
+    # Sınır hem şablon sayısı hem de tahmini bayt: ham dosya + hazırdaki her kopya için workbook_size.
+    def __init__(self, max_templates=TEMPLATE_POOL_MAX, spares=SPARES_PER_TEMPLATE, max_bytes=TEMPLATE_POOL_MAX_BYTES):
+        self.max_templates = max_templates
+        self.max_bytes = max_bytes
+        self.spares = spares
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._filled = threading.Condition(self._lock)  # Arka plandaki parse bitince bekleyen checkout uyandırılır
+
+    @staticmethod
+    def _parse(data):
+        import openpyxl
+        return openpyxl.load_workbook(io.BytesIO(data))
+
+    def _entry(self, template_file):
+        key = file_digest(template_file)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return key, entry
+        data = template_file.read()
+        template_file.seek(0)
+        with self._lock:
+            entry = self._entries.setdefault(key, _PoolEntry(data))
+            self._entries.move_to_end(key)
+            self._trim(keep=entry)
+        return key, entry
+
+    def _trim(self, keep):
+        # Kilit tutulurken çağrılır; en eski kullanılan şablonlar atılır, az önce kullanılan hiç atılmaz
+        while len(self._entries) > self.max_templates or self.resident_bytes() > self.max_bytes:
+            victim = next((k for k, e in self._entries.items() if e is not keep), None)
+            if victim is None: break
+            del self._entries[victim]
+            self.evictions += 1
+
+    def resident_bytes(self):
+        return sum(e.size() for e in self._entries.values())
+
+    def checkout(self, template_file):
+        key, entry = self._entry(template_file)
+        with self._lock:
+            # Kopya arka planda parse ediliyorsa o beklenir; aynı şablon aynı anda iki kez parse edilmez
+            while not entry.spares and entry.filling: self._filled.wait()
+            wb = entry.spares.pop() if entry.spares else None
+            if wb is None: self.misses += 1
+            else: self.hits += 1
+        if wb is None: wb = self._parse(entry.data)
+        self._replenish(key, entry)
+        return wb
+
+    def prewarm(self, template_file):
+        # Şablon yüklendiği anda (henüz buton basılmadan) ilk kopya arka planda hazırlanır
+        self._replenish(*self._entry(template_file))
+
+    def _replenish(self, key, entry):
+        with self._lock:
+            if entry.filling or entry.oversize or len(entry.spares) >= self.spares: return
+            entry.filling = True
+        threading.Thread(target=self._fill, args=(key, entry), name="template-pool-fill", daemon=True).start()
+
+    def _fill(self, key, entry):
+        try:
+            while True:
+                with self._lock:
+                    if self._entries.get(key) is not entry or len(entry.spares) >= self.spares: return
+                wb = self._parse(entry.data)
+                with self._lock:
+                    entry.parsed_bytes = workbook_size(wb)
+                    if len(entry.data) + entry.parsed_bytes > self.max_bytes: entry.oversize = True
+                    if self._entries.get(key) is not entry or entry.oversize: return
+                    entry.spares.append(wb)
+                    self._trim(keep=entry)
+                    self._filled.notify_all()
+        except Exception:
+            pass  # Bozuk şablonun hatası checkout sırasındaki normal parse'da kullanıcıya gösterilir
+        finally:
+            with self._lock:
+                entry.filling = False
+                self._filled.notify_all()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'templates': len(self._entries), 'ready': sum(len(e.spares) for e in self._entries.values()),
+                'resident_bytes': self.resident_bytes(), 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Süreç boyunca tek havuz; Streamlit oturumları aynı şablon kopyalarından beslenir
+TEMPLATE_POOL = TemplatePool()
@@ -0,0 +1,1152 @@
+import pandas as pd
+import openpyxl
+from openpyxl.utils import get_column_letter
+from openpyxl.styles import Alignment, Border, Side, Font, PatternFill
+import re
+import copy
+import math
+import numbers
+import numpy as np
+import os
+import pickle
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from exportspool import spool_workbook
+from memocache import TEXT_CACHE, SHARED_CACHE, memoize_text, file_digest, approx_size
+from templatepool import TEMPLATE_POOL
+from imagecheck import ImageUrlChecker
+from procpool import fork_pool, default_workers
+
+# --- 2. YARDIMCI VE LOJİSTİK FONKSİYONLAR ---
+
+def get_dim_val(pattern, text):
+    match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+    if match:
+        try:
+            return float(match.group(1).replace(',', '.'))
+        except:
+            return None
+    return None
+
+@memoize_text(TEXT_CACHE)
+def extract_overall_dims(text):
+    if pd.isna(text):
+        return None, None, None
+    text = str(text)
+    
+    dia = get_dim_val(r'(?:Diameter|Çap|Dia|Ø)\s*[:\-\s]\s*(\d+(?:[.,]\d+)?)', text)
+    w = get_dim_val(r'(?:Width|Genişlik|Side to Side|\bW\b)\s*[:\-\s]\s*(\d+(?:[.,]\d+)?)', text)
+    h = get_dim_val(r'(?:Height|Yükseklik|Top to Bottom|\bH\b)\s*[:\-\s]\s*(\d+(?:[.,]\d+)?)', text)
+    d = get_dim_val(r'(?:Depth|Derinlik|Front to Back|\bD\b)\s*[:\-\s]\s*(\d+(?:[.,]\d+)?)', text)
+    
+    if dia:
+        if not w: w = dia
+        if not d: d = dia
+            
+    if not any([w, h, d]):
+        size_match = re.search(
+            r'(?:Size|Ölçü|Dimension|Boyut)?[:\s]*(\d+(?:[.,]\d+)?)\s*[xX×]\s*(\d+(?:[.,]\d+)?)(?:\s*[xX×]\s*(\d+(?:[.,]\d+)?))?', 
+            text
+        )
+        if size_match:
+            h = float(size_match.group(1).replace(',', '.'))
+            w = float(size_match.group(2).replace(',', '.'))
+            if size_match.group(3): 
+                d = float(size_match.group(3).replace(',', '.'))
+                
+    return h, w, d
+
+def convert_to_inch(val):
+    if val: 
+        return round(val * 0.393701, 2)
+    return None
+
+@memoize_text(TEXT_CACHE)
+def translate_features(text, do_conversion):
+    if pd.isna(text): 
+        return ""
+    text = str(text)
+    text = re.sub(r'Ø\s*[:\-]?\s*', 'Diameter: ', text)
+    text = re.sub(r'(?i)\bÇap\s*[:\-]?\s*', 'Diameter: ', text)
+    
+    if not do_conversion: 
+        return text
+
+    def c_in(m): return f"{round(float(m.group(1).replace(',', '.')) * 0.393701, 2)}"
+    def c_mm(m): return f"{round(float(m.group(1).replace(',', '.')) * 0.0393701, 2)}"
+    def c_kg(m): return f"{round(float(m.group(1).replace(',', '.')) * 2.20462, 2)}"
+    def c_ml(m): return f"{round(float(m.group(1).replace(',', '.')) * 0.033814, 2)}"
+
+    text = re.sub(r'(?<![a-zA-Z0-9])(\d+(?:[\.,]\d+)?)\s*cm(?![a-zA-Z])', lambda m: c_in(m) + ' inches', text, flags=re.IGNORECASE)
+    text = re.sub(r'(?<![a-zA-Z0-9])(\d+(?:[\.,]\d+)?)\s*mm(?![a-zA-Z])', lambda m: c_mm(m) + ' inches', text, flags=re.IGNORECASE)
+    text = re.sub(r'(?<![a-zA-Z0-9])(\d+(?:[\.,]\d+)?)\s*kg(?![a-zA-Z])', lambda m: c_kg(m) + ' lbs', text, flags=re.IGNORECASE)
+    text = re.sub(r'(?<![a-zA-Z0-9])(\d+(?:[\.,]\d+)?)\s*ml(?![a-zA-Z])', lambda m: c_ml(m) + ' fl oz', text, flags=re.IGNORECASE)
+    text = re.sub(r'(?<![a-zA-Z0-9:])(\d+(?:[\.,]\d+)?)(?=\s*[xX×]\s*\d)', c_in, text)
+    text = re.sub(r'(?<![a-zA-Z])\bcm\b(?![a-zA-Z])', 'inches', text, flags=re.IGNORECASE)
+    text = re.sub(r'(?<![a-zA-Z])\bmm\b(?![a-zA-Z])', 'inches', text, flags=re.IGNORECASE)
+    
+    return text
+
+def calculate_freight_class_total(total_weight_lbs, total_volume_in3):
+    vol_ft3 = total_volume_in3 / 1728
+    if vol_ft3 == 0: 
+        return "60"
+    dens = total_weight_lbs / vol_ft3
+    if dens < 1: return "400"
+    elif dens < 2: return "300"
+    elif dens < 4: return "200"
+    elif dens < 6: return "150"
+    elif dens < 8: return "125"
+    elif dens < 10: return "100"
+    else: return "60"
+
+@memoize_text(TEXT_CACHE)
+def extract_bedding_info(features, description, raw_h, raw_w):
+    text_lower = (str(features) + " " + str(description)).lower()
+    total_pieces = 0
+    pillow_match = re.search(r'(?:pillowcase|pillow case|yastık kılıfı).*?(\d+)\s*(?:piece|adet|pcs)', text_lower)
+    
+    if pillow_match: total_pieces += int(pillow_match.group(1))
+    elif 'pillowcase' in text_lower or 'yastık kılıfı' in text_lower: total_pieces += 1
+        
+    if any(x in text_lower for x in ['duvet cover', 'quilt cover', 'nevresim']): total_pieces += 1
+    if any(x in text_lower for x in ['fitted sheet', 'çarşaf']): total_pieces += 1
+    if any(x in text_lower for x in ['flat sheet', 'düz çarşaf']): total_pieces += 1
+    if any(x in text_lower for x in ['bedspread', 'yatak örtüsü']): total_pieces += 1
+    if any(x in text_lower for x in ['comforter', 'yorgan']): total_pieces += 1
+    if any(x in text_lower for x in ['blanket', 'battaniye']): total_pieces += 1
+        
+    pieces_str = str(total_pieces) if total_pieces > 0 else ""
+    
+    set_single = ""
+    if total_pieces > 1: set_single = "Set (matching pieces included)"
+    elif total_pieces == 1: set_single = "Single Piece"
+        
+    material = ""
+    if 'cotton blend' in text_lower or ('cotton' in text_lower and 'polyester' in text_lower): material = "Cotton Blend"
+    elif 'cotton' in text_lower or 'pamuk' in text_lower: material = "Cotton"
+    elif 'microfiber' in text_lower or 'mikrofiber' in text_lower: material = "Microfiber"
+    elif 'polyester' in text_lower: material = "Polyester"
+    elif 'satin' in text_lower or 'saten' in text_lower: material = "Satin"
+    elif 'linen' in text_lower or 'keten' in text_lower: material = "Linen"
+    elif 'flannel' in text_lower or 'pazen' in text_lower: material = "Flannel"
+    elif 'silk' in text_lower or 'ipek' in text_lower: material = "Silk"
+    elif 'velvet' in text_lower or 'kadife' in text_lower: material = "Velour"
+    elif 'rayon' in text_lower or 'viskon' in text_lower: material = "Rayon"
+    
+    prod_type = ""
+    is_bedding = False
+    
+    if 'duvet cover' in text_lower or 'nevresim' in text_lower or 'quilt cover' in text_lower: 
+        prod_type = "Duvet Cover"; is_bedding = True
+    elif 'bedspread' in text_lower or 'yatak örtüsü' in text_lower: 
+        prod_type = "Bedspread"; is_bedding = True
+    elif 'quilt' in text_lower: 
+        prod_type = "Quilt"; is_bedding = True
+    elif 'comforter' in text_lower or 'yorgan' in text_lower: 
+        prod_type = "Comforter"; is_bedding = True
+    elif 'coverlet' in text_lower: 
+        prod_type = "Coverlet"; is_bedding = True
+    elif 'pillowcase' in text_lower or 'yastık kılıfı' in text_lower or 'sham' in text_lower: 
+        prod_type = "Sham"
+        
+    bed_size = ""
+    max_dim = max(float(raw_h or 0), float(raw_w or 0))
+    
+    if max_dim > 0 and (is_bedding or prod_type == "Sham"):
+        if max_dim >= 250: bed_size = "California King"
+        elif max_dim >= 230: bed_size = "King"
+        elif max_dim >= 200: bed_size = "Queen"
+        elif max_dim >= 180: bed_size = "Full / Double"
+        else: bed_size = "Twin"
+        
+    new_name = str(description)
+    new_name = re.sub(r'\s*\([A-Z]{2,3}\)\s*', ' ', new_name)
+    
+    size_words = [r'\bSingle XXL\b', r'\bSingle XL\b', r'\bSingle\b', r'\bDouble\b', r'\bKing\b', r'\bSuper King\b', r'\bMega King\b', r'\bQueen\b', r'\bTwin\b', r'\bFull\b']
+    for word in size_words: 
+        new_name = re.sub(word, '', new_name, flags=re.IGNORECASE)
+        
+    new_name = re.sub(r'\s+', ' ', new_name).strip()
+    if bed_size and prod_type != "Sham" and is_bedding: 
+        new_name = f"{bed_size} {new_name}"
+        
+    return {'pieces': pieces_str, 'set_single': set_single, 'material': material, 'prod_type': prod_type, 'bed_size': bed_size, 'new_name': new_name}
+
+@memoize_text(TEXT_CACHE)
+def generate_bedding_note(text, h_val, w_val, bed_size, is_us):
+    if not is_us or not text: return ""
+    text_lower = str(text).lower()
+    is_bedding = any(k in text_lower for k in ['duvet', 'quilt', 'bedspread', 'nevresim', 'yorgan', 'yatak örtüsü', 'comforter', 'coverlet'])
+    is_pillow = any(k in text_lower for k in ['pillowcase', 'yastık kılıfı', 'sham'])
+
+    if not (is_bedding or is_pillow): return ""
+
+    h_in = round(float(h_val) * 0.393701, 2) if h_val else ""
+    w_in = round(float(w_val) * 0.393701, 2) if w_val else ""
+    dims_str = f"{h_in} x {w_in}" if h_in and w_in else f"{h_in or w_in}"
+    
+    if is_bedding and bed_size: 
+        return f"This beautiful set is crafted to European standards. Measuring {dims_str} inches, it beautifully complements your {bed_size} bed, offering a cozy and elegant drape."
+    elif is_pillow: 
+        return f"Crafted in Türkiye, these pillowcases measure {dims_str} inches. They are a wonderful fit for standard US pillows, bringing a touch of European comfort to your bedroom."
+    return ""
+
+def get_brand_by_category(category_text):
+    if pd.isna(category_text) or not str(category_text).strip(): return ""
+    cat_lower = str(category_text).lower()
+    if "sofa" in cat_lower or "koltuk" in cat_lower or "kanepe" in cat_lower: return "Hanah Home"
+    elif "wall deco" in cat_lower or "duvar" in cat_lower or "tablo" in cat_lower: return "Wallity"
+    elif "rug" in cat_lower or "carpet" in cat_lower or "halı" in cat_lower or "kilim" in cat_lower: return "Conceptum Hypnose"
+    elif "kitchen" in cat_lower or "mutfak" in cat_lower: return "Hermia Concept"
+    elif "lighting" in cat_lower or "aydınlatma" in cat_lower or "avize" in cat_lower or "lamba" in cat_lower: return "Opviq"
+    elif "furniture" in cat_lower or "mobilya" in cat_lower: return "Skye Decor"
+    elif "bathroom" in cat_lower or "banyo" in cat_lower: return "Mijölnir"
+    elif "bedroom" in cat_lower or "yatak odası" in cat_lower: return "L'Essentiel Linge de Maison"
+    elif "decoration" in cat_lower or "dekorasyon" in cat_lower or "aksesuar" in cat_lower: return "Evila Originals"
+    return ""
+
+AUTO_MAPPED_COLS = {
+    'core::supplierPartNumber', 'core::manufacturerPartNumber', 'core::universalProductCode',
+    'core::productName', 'featureDescription::romanceCopy', 'featureDescription::overallHeight',
+    'featureDescription::overallWidth', 'featureDescription::overallDepth', 'featureDescription::color',
+    'featureDescription::genericFeatures', 'shippingAndFulfillment::weight', 'shippingAndFulfillment::height',
+    'shippingAndFulfillment::width', 'shippingAndFulfillment::depth', 'price::wholesalePrice',
+    'price::manufacturerSuggestedRetailPrice', 'shippingAndFulfillment::minimumOrderQuantity',
+    'shippingAndFulfillment::forceQuantityMultiplier', 'shippingAndFulfillment::displaySetQuantity',
+    'shippingAndFulfillment::productWeight', 'featureDescription::overallProductWeight', 'shippingAndFulfillment::leadTime',
+    'shippingAndFulfillment::replacementLeadTime', 'shippingAndFulfillment::shipType',
+    'shippingAndFulfillment::freightClass', 'core::collectionName', 'core::manufacturerId',
+    'featureDescription::marketingCopy', 'bedding::setSingle', 'bedding::productType', 
+    'bedding::size', 'bedding::material', 'bedding::pieces'
+}
+
+def is_auto_mapped_by_fname(fname):
+    f_low = fname.lower().strip()
+    exact_matches = {
+        'overall height', 'overall width', 'overall depth', 'overallheight', 
+        'overallwidth', 'overalldepth', 'overall product weight', 'overallproductweight', 'color', 'colour', 'marketing copy', 
+        'marketingcopy', 'set / single', 'bedding product type', 'bedding size', 
+        'bedding material', 'pieces included', 'total number of pieces included'
+    }
+    return f_low in exact_matches
+
+TEMPLATE_SKIP_SHEETS = ["Additional", "WAYFAIR", "Instructions", "Valid Values", "Failed"]
+CUSTOM_VALUE_OPTION = "➕ Custom Value"
+
+def read_template_schema(template_file):
+    # Dinamik form için şablonun sadece başlık satırları ve Valid Values listeleri gerekir; tek seferde hazırlanır
+    template_file.seek(0)
+    try: df_v = pd.read_excel(template_file, sheet_name='Valid Values')
+    except: df_v = None
+
+    template_file.seek(0)
+    wb_t = openpyxl.load_workbook(template_file, read_only=True)
+    try:
+        target_name = next((s for s in wb_t.sheetnames if not any(x in s for x in TEMPLATE_SKIP_SHEETS)), wb_t.sheetnames[0])
+        header_rows = [list(r) for r in wb_t[target_name].iter_rows(min_row=1, max_row=4, values_only=True)]
+    finally:
+        wb_t.close()
+    header_rows += [[] for _ in range(4 - len(header_rows))]
+    width = max(len(r) for r in header_rows)
+    r1, r3, r4 = [r + [None] * (width - len(r)) for r in (header_rows[0], header_rows[2], header_rows[3])]
+
+    eligible_cols, options = [], {}
+    for c in range(width):
+        wid = str(r1[c]).strip()
+        status = str(r3[c]).strip()
+        fname = str(r4[c]).strip()
+        if status.lower() == "required" and wid not in AUTO_MAPPED_COLS and not wid.startswith('media::') and not is_auto_mapped_by_fname(fname):
+            eligible_cols.append((wid, fname))
+            if fname in options: continue
+            if df_v is not None and fname in df_v.columns:
+                opts = list(dict.fromkeys([str(o).strip() for o in df_v[fname].dropna().unique() if str(o).strip() and str(o).strip() != 'None']))
+                # GÜNCELLEME: "Select all" seçeneklerini ortadan kaldırıyoruz
+                opts = [o for o in opts if "select all" not in o.lower()]
+            else: 
+                opts = ["Yes", "No", "Does Not Apply"]
+            # GÜNCELLEME: Custom değer için seçenek ekleme
+            options[fname] = tuple(opts + [CUSTOM_VALUE_OPTION])
+
+    return {'target_name': target_name, 'eligible_cols': eligible_cols, 'options': options, 'header_rows': (r1, r3, r4)}
+
+# --- ŞABLON SÜTUN YARDIMCILARI ---
+DATA_START_ROW = 8
+
+def sheet_header_rows(ws):
+    return [ws.cell(row=1, column=c).value for c in range(1, ws.max_column + 1)], [ws.cell(row=4, column=c).value for c in range(1, ws.max_column + 1)]
+
+def header_keys(r1_vals):
+    # Aynı başlık birden fazla sütunda olabilir (genericFeatures gibi); sıra numarasıyla ayırıyoruz
+    seen, keys = {}, []
+    for v in r1_vals:
+        name = str(v).strip() if v is not None else ""
+        seen[name] = seen.get(name, 0) + 1
+        keys.append(name if seen[name] == 1 else f"{name}#{seen[name]}")
+    return keys
+
+def template_column_map(r1_vals, r4_vals):
+    # Şablonun 1. (alan kimliği) ve 4. (alan adı) satırından veri anahtarı -> sütun no eşlemesi
+    # Sütunlar bir kez tamsayı indekse çözülür; hücrelere A1 koordinatı kurmadan yazılır
+    col_map = {}
+    for col_idx, (v1, v4) in enumerate(zip(r1_vals, r4_vals), 1):
+        r1_val = str(v1).strip() if v1 else ""
+        r4_val = str(v4).strip() if v4 else ""
+        
+        if r1_val: col_map[r1_val] = col_idx
+            
+        r4_lower = r4_val.lower()
+        r1_lower = r1_val.lower()
+
+        if ('color' in r4_lower or 'colour' in r4_lower or r1_lower.endswith('::color')):
+            if 'leg' not in r4_lower and 'base' not in r4_lower and 'shade' not in r4_lower: col_map['featureDescription::color'] = col_idx
+        if 'overall height' in r4_lower or 'overallheight' in r1_lower: col_map['featureDescription::overallHeight'] = col_idx
+        elif 'overall width' in r4_lower or 'overallwidth' in r1_lower: col_map['featureDescription::overallWidth'] = col_idx
+        elif 'overall depth' in r4_lower or 'overalldepth' in r1_lower: col_map['featureDescription::overallDepth'] = col_idx
+        
+        # Mapping for Overall Product Weight
+        if 'overall product weight' in r4_lower or 'overallproductweight' in r1_lower: 
+            col_map['featureDescription::overallProductWeight'] = col_idx
+            
+        if 'set / single' in r4_lower: col_map['bedding::setSingle'] = col_idx
+        if 'bedding product type' in r4_lower: col_map['bedding::productType'] = col_idx
+        if 'bedding size' in r4_lower: col_map['bedding::size'] = col_idx
+        if 'bedding material' in r4_lower: col_map['bedding::material'] = col_idx
+        if 'pieces included' in r4_lower or 'total number of pieces included' in r4_lower: col_map['bedding::pieces'] = col_idx
+
+        for i in range(1, 6):
+            if f'image file name or url {i}' in r4_lower: col_map[f'img_{i}'] = col_idx
+
+    feature_cols = [c for c, v in enumerate(r1_vals, 1) if str(v).strip() == 'featureDescription::genericFeatures']
+    return col_map, feature_cols
+
+def additional_image_cols(r1_vals, r4_vals):
+    sku_col, url_col = 1, 2
+    for c, (v1, v4) in enumerate(zip(r1_vals, r4_vals), 1):
+        r1, r4 = str(v1).lower(), str(v4).lower()
+        if 'supplier part number' in r4 or 'sku' in r4 or 'part number' in r1: sku_col = c
+        if 'image file name or url' in r4 or 'url' in r4 or 'media::' in r1: url_col = c
+    return sku_col, url_col
+
+def additional_carton_cols(r1_vals, r4_vals):
+    cols = {}
+    for c, (v1, v4) in enumerate(zip(r1_vals, r4_vals), 1):
+        r1, r4 = str(v1).lower(), str(v4).lower()
+        if 'supplier part number' in r4 or 'sku' in r4 or 'part number' in r1: cols['sku'] = c
+        elif 'weight' in r4 or 'weight' in r1: cols['weight'] = c
+        elif 'height' in r4 or 'height' in r1: cols['height'] = c
+        elif 'width' in r4 or 'width' in r1: cols['width'] = c
+        elif 'depth' in r4 or 'depth' in r1: cols['depth'] = c
+    return cols
+
+def first_empty_row(ws, col, start_row=4):
+    # Ek sayfada ilk boş satır bir kez bulunur; sonraki satırlar sayaçla eklenir
+    for r, (v,) in enumerate(ws.iter_rows(min_row=start_row, max_row=ws.max_row, min_col=col, max_col=col, values_only=True), start_row):
+        if not v: return r
+    return max(ws.max_row + 1, start_row)
+
+def carton_output_values(carton, is_us):
+    kg, x, y, z = carton
+    if not is_us: return kg, x, y, z
+    return round(kg * 2.20462, 2), round(x * 0.393701, 2), round(y * 0.393701, 2), round(z * 0.393701, 2)
+
+# --- DELTA (ÖNCEKİ YÜKLEMEYE GÖRE) ---
+def delta_norm(v):
+    if v is None: return ''
+    if isinstance(v, bool): return v
+    if isinstance(v, numbers.Number):
+        f = float(v)
+        return '' if math.isnan(f) else round(f, 6)
+    return str(v).strip()
+
+def build_baseline_index(baseline_file):
+    # Önceki yükleme tek geçişte (read-only, satır satır) okunur: (SKU, kaçıncı geçişi) -> {sütun anahtarı: değer}
+    # Aynı SKU birden fazla satırdaysa her satır kendi sırasındaki satırla karşılaştırılır
+    baseline_file.seek(0)
+    wb = openpyxl.load_workbook(baseline_file, read_only=True, data_only=True)
+    try:
+        target_name = next((s for s in wb.sheetnames if not any(x in s for x in TEMPLATE_SKIP_SHEETS)), wb.sheetnames[0])
+        rows_it = wb[target_name].iter_rows(values_only=True)
+        header = list(next(rows_it, ()))
+        keys = header_keys(header)
+        if 'core::supplierPartNumber' not in keys: raise ValueError("Baseline file has no core::supplierPartNumber column")
+        sku_idx = keys.index('core::supplierPartNumber')
+        rows, occurrences = {}, {}
+        for r_no, vals in enumerate(rows_it, 2):
+            if r_no < DATA_START_ROW or sku_idx >= len(vals) or vals[sku_idx] in (None, ''): continue
+            sku = str(vals[sku_idx]).strip()
+            n = occurrences[sku] = occurrences.get(sku, -1) + 1
+            rows[(sku, n)] = {k: delta_norm(v) for k, v in zip(keys, vals) if delta_norm(v) != ''}
+
+        images, cartons = {}, {}
+        img_sheet = next((s for s in wb.sheetnames if 'additional' in s.lower() and 'image' in s.lower()), None)
+        if img_sheet:
+            all_rows = list(wb[img_sheet].iter_rows(values_only=True))
+            if len(all_rows) >= 4:
+                sku_col, url_col = additional_image_cols(all_rows[0], all_rows[3])
+                for vals in all_rows[4:]:
+                    if len(vals) >= max(sku_col, url_col) and vals[sku_col - 1]:
+                        images.setdefault(str(vals[sku_col - 1]).strip(), []).append(delta_norm(vals[url_col - 1]))
+        carton_sheet = next((s for s in wb.sheetnames if 'additional' in s.lower() and ('carton' in s.lower() or 'package' in s.lower())), None)
+        if carton_sheet:
+            all_rows = list(wb[carton_sheet].iter_rows(values_only=True))
+            if len(all_rows) >= 4:
+                cols = additional_carton_cols(all_rows[0], all_rows[3])
+                if 'sku' in cols:
+                    for vals in all_rows[4:]:
+                        if len(vals) >= cols['sku'] and vals[cols['sku'] - 1]:
+                            cartons.setdefault(str(vals[cols['sku'] - 1]).strip(), []).append(
+                                tuple(delta_norm(vals[cols[k] - 1]) if k in cols and cols[k] <= len(vals) else '' for k in ('weight', 'height', 'width', 'depth')))
+    finally:
+        wb.close()
+    return {'rows': rows, 'images': images, 'cartons': cartons}
+
+def diff_against_baseline(baseline, sku_key, occurrence, row_writes, col_keys, row_images, row_cartons, is_us):
+    # None: SKU'nun bu geçişi baseline'da yok (yeni). Liste: değişen alanlar (boş liste = aynı)
+    # occurrence: SKU'nun data dosyasında kaçıncı kez geçtiği (0'dan başlar)
+    # row_images/row_cartons None: ekler bu SKU'nun önceki bir satırında karşılaştırıldı. Boş liste: ek yok (silinmiş olabilir)
+    old = baseline['rows'].get((sku_key, occurrence))
+    if old is None: return None
+    new = {col_keys[col]: delta_norm(v) for col, v in row_writes.items() if col in col_keys}
+    new = {k: v for k, v in new.items() if v != ''}
+    changed = [k for k in dict.fromkeys(list(new) + list(old)) if new.get(k, '') != old.get(k, '')]
+    if row_images is not None and [delta_norm(u) for _, u in row_images] != baseline['images'].get(sku_key, []):
+        changed.append('Additional Images')
+    if row_cartons is not None:
+        new_cartons = [tuple(delta_norm(v) for v in carton_output_values(c, is_us)) for c in row_cartons]
+        if new_cartons != baseline['cartons'].get(sku_key, []): changed.append('Additional Cartons')
+    return changed
+
+def validate_column_mappings(col_map, mappings):
+    return [k for k in mappings if k not in col_map]
+
+def read_data_frame(data_file):
+    data_file.seek(0)
+    df_data = pd.read_excel(data_file)
+    if 'CODE' in df_data.columns:
+        df_data = df_data.dropna(subset=['CODE'])
+        df_data = df_data[df_data['CODE'].astype(str).str.strip() != '']
+    else: 
+        df_data = df_data.dropna(how='all')
+        
+    return df_data.reset_index(drop=True)
+
+# --- KOLİ DEPOSU ---
+CARTON_FIELDS = ('kg', 'x', 'y', 'z')
+
+class CartonStore:
+    # Koli dosyası tek float dizide tutulur: satırlar (kg, x, y, z), her SKU'nun kolileri bitişik ve
+    # (hacim, kg) büyükten küçüğe bir kez sıralı. SKU -> sıra no, offsets[no]:offsets[no+1] o SKU'nun dilimi.
+    def __init__(self, values, offsets, groups):
+        self.values = values
+        self.offsets = offsets
+        self.groups = groups
+
+    @classmethod
+    def from_frame(cls, df, code_col, value_cols):
+        codes = np.array([str(v).strip() for v in df[code_col].tolist()] if code_col else [''] * len(df), dtype=object)
+        keep = np.array([c != '' and c.lower() != 'nan' for c in codes], dtype=bool)
+        values = np.zeros((len(df), len(CARTON_FIELDS)), dtype=np.float64)
+        bad = np.zeros(len(df), dtype=bool)
+        for i, col in enumerate(value_cols):
+            if not col: continue
+            num = pd.to_numeric(df[col], errors='coerce')
+            # Sayıya çevrilemeyen tek bir hücre bile o kolinin tüm değerlerini 0 yapar (eski float() davranışı)
+            bad |= (df[col].notna() & num.isna()).to_numpy()
+            values[:, i] = num.fillna(0).to_numpy(dtype=np.float64)
+        values[bad] = 0
+        codes, values = codes[keep], values[keep]
+
+        group_ids, uniques = pd.factorize(codes)
+        # ZORUNLU SIRALAMA: SKU içinde hacim, sonra kg büyükten küçüğe; eşitlerde dosyadaki sıra korunur
+        order = np.lexsort((-values[:, 0], -(values[:, 1] * values[:, 2] * values[:, 3]), group_ids))
+        offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(group_ids, minlength=len(uniques)), out=offsets[1:])
+        return cls(np.ascontiguousarray(values[order]), offsets, {sku: n for n, sku in enumerate(uniques)})
+
+    def span(self, sku):
+        n = self.groups.get(sku)
+        return None if n is None else (int(self.offsets[n]), int(self.offsets[n + 1]))
+
+    def rows(self, start, stop):
+        # Python float listeleri: openpyxl'e ve yuvarlamaya numpy tipleri sızmaz
+        return [tuple(c) for c in self.values[start:stop].tolist()]
+
+    def __contains__(self, sku):
+        return sku in self.groups
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.offsets.nbytes + approx_size(self.groups)
+
+def build_carton_store(carton_file):
+    carton_file.seek(0)
+    df_carton = pd.read_excel(carton_file)
+    
+    def find_col(df, keywords):
+        for col in df.columns:
+            if all(kw in str(col).lower() for kw in keywords): return col
+        return None
+        
+    c_code_col = find_col(df_carton, ['code']) or find_col(df_carton, ['sku'])
+    value_cols = [find_col(df_carton, ['weight']), find_col(df_carton, ['size', '- x']),
+                  find_col(df_carton, ['size', '- y']), find_col(df_carton, ['size', '- z'])]
+    return CartonStore.from_frame(df_carton, c_code_col, value_cols)
+
+# --- PAYLAŞILAN ÖNBELLEK ---
+# Aynı içerikteki yüklemeler (farklı oturumlar dahil) tek bir ayrıştırılmış kopyayı paylaşır.
+# Dönen yapılar paylaşıldığı için çağıranlar bunları yerinde değiştirmemelidir.
+def load_data_frame(data_file):
+    return SHARED_CACHE.get_or_build(('data', file_digest(data_file)), lambda: read_data_frame(data_file))
+
+def load_carton_store(carton_file):
+    return SHARED_CACHE.get_or_build(('carton', file_digest(carton_file)), lambda: build_carton_store(carton_file))
+
+def load_template_schema(template_file):
+    return SHARED_CACHE.get_or_build(('schema', file_digest(template_file)), lambda: read_template_schema(template_file))
+
+# --- SATIR HESABI (paralel) + TEK YAZICI ---
+# Satır değerleri birbirinden bağımsız hesaplanır; workbook'a sadece ana süreç, satır sırasıyla yazar.
+PARALLEL_MIN_ROWS = int(os.environ.get("ASIR_PARALLEL_MIN_ROWS", "400"))
+PARALLEL_CHUNK_ROWS = 200
+MAX_ROW_WORKERS = int(os.environ.get("ASIR_ROW_WORKERS", "4"))
+
+_worker_ctx = None
+
+def compute_row_record(index, row, ctx):
+    col_map, feature_cols, columns = ctx['col_map'], ctx['feature_cols'], ctx['columns']
+    cat_col_name, carton_store = ctx['cat_col_name'], ctx['carton_store']
+    ui_data = ctx['ui_data']
+
+    sku_key = str(row.get('CODE', '')).strip()
+    try: pkg_count = int(float(row.get('NUMBER OF PACKAGES', 1)))
+    except: pkg_count = 1
+
+    # Koli: (kg, x, y, z)
+    raw_cartons = [(float(row.get('WEIGHT (Kg)', 0) or 0),
+                    float(row.get('PACKAGING SIZE - X (cm)', 0) or 0),
+                    float(row.get('PACKAGING SIZE - Y (cm)', 0) or 0),
+                    float(row.get('PACKAGING SIZE - Z (cm)', 0) or 0))]
+
+    leave_carton_blank = False 
+    # Ek koliler (Ana Koli hariç) depodaki dilimle taşınır: (başlangıç, bitiş)
+    row_cartons = ()
+
+    span = carton_store.span(sku_key) if carton_store is not None else None
+    if span:
+        # ZORUNLU SIRALAMA: Hacim * Ağırlık prensibiyle en büyük koli 1. koli (Ana Koli); depoda zaten sıralı
+        raw_cartons = carton_store.rows(*span)
+        if span[1] - span[0] > 1: row_cartons = (span[0] + 1, span[1])
+    elif pkg_count > 1:
+        leave_carton_blank = True
+
+    kg, x_cm, y_cm, z_cm = raw_cartons[0]
+    
+    if len(raw_cartons) > 1:
+        prod_weight_lbs = max(0, round((sum(c[0] for c in raw_cartons) * 2.20462) - 5, 2))
+    else:
+        prod_weight_lbs = max(0, round((kg - 0.1) * 2.20462, 2)) if kg > 0.1 else 0
+
+    record = {'index': index, 'sku': sku_key, 'desc': str(row.get('DESCRIPTION', '') or '')[:60], 'missing': None, 'error': None}
+    try:
+        feat_text = row.get('FEATURES', '')
+        raw_h, raw_w, raw_d = extract_overall_dims(feat_text)
+        b_info = extract_bedding_info(feat_text, row.get('DESCRIPTION', ''), raw_h, raw_w)
+        
+        lbs = round(kg * 2.20462, 2)
+        x_in = round(x_cm * 0.393701, 2)
+        y_in = round(y_cm * 0.393701, 2)
+        z_in = round(z_cm * 0.393701, 2)
+        
+        ean = row.get('EAN CODE', '')
+        ean_str = "{:.0f}".format(float(ean)) if pd.notna(ean) and str(ean).strip() != '' else ""
+
+        color_val = str(row.get('COLOR', ''))
+        if color_val.lower() == 'nan': color_val = ''
+        else: color_val = re.sub(r'\s*;\s*', '; ', color_val.replace('\n', ';').replace(',', ';').replace('/', ';')).strip('; ')
+
+        cat_val = row.get(cat_col_name, '') if cat_col_name else ''
+        auto_brand = get_brand_by_category(cat_val)
+
+        mappings = {
+            'core::supplierPartNumber': sku_key, 
+            'core::manufacturerPartNumber': sku_key, 
+            'core::universalProductCode': ean_str,
+            'core::productName': b_info['new_name'] if b_info['new_name'] else row.get('DESCRIPTION'),
+            'price::wholesalePrice': row.get('PRICE'), 
+            'price::manufacturerSuggestedRetailPrice': row.get('RETAIL PRICE'),
+            'featureDescription::overallHeight': convert_to_inch(raw_h) if ui_data['is_us'] else raw_h,
+            'featureDescription::overallWidth': convert_to_inch(raw_w) if ui_data['is_us'] else raw_w,
+            'featureDescription::overallDepth': convert_to_inch(raw_d) if ui_data['is_us'] else raw_d,
+            'featureDescription::color': color_val, 
+            'core::manufacturerId': auto_brand, 
+            'shippingAndFulfillment::minimumOrderQuantity': 1, 
+            'shippingAndFulfillment::forceQuantityMultiplier': 1, 
+            'shippingAndFulfillment::displaySetQuantity': 1,
+            'bedding::setSingle': b_info['set_single'], 
+            'bedding::productType': b_info['prod_type'], 
+            'bedding::size': b_info['bed_size'],
+            'bedding::material': b_info['material'], 
+            'bedding::pieces': b_info['pieces']
+        }
+        
+        if leave_carton_blank:
+            mappings['shippingAndFulfillment::weight'] = ""
+            mappings['shippingAndFulfillment::height'] = ""
+            mappings['shippingAndFulfillment::width'] = ""
+            mappings['shippingAndFulfillment::depth'] = ""
+            mappings['shippingAndFulfillment::productWeight'] = ""
+            mappings['featureDescription::overallProductWeight'] = ""
+        else:
+            mappings['shippingAndFulfillment::weight'] = lbs
+            mappings['shippingAndFulfillment::height'] = x_in
+            mappings['shippingAndFulfillment::width'] = y_in
+            mappings['shippingAndFulfillment::depth'] = z_in
+            # Birebir Overall Product Weight ve normal weight'e yazılıyor
+            mappings['shippingAndFulfillment::productWeight'] = prod_weight_lbs
+            mappings['featureDescription::overallProductWeight'] = prod_weight_lbs
+
+        urls = []
+        for col in columns:
+            col_str = str(col).lower()
+            if 'image' in col_str or 'resim' in col_str or 'url' in col_str or 'link' in col_str:
+                if 'number' in col_str or 'sayı' in col_str or 'adet' in col_str: continue
+                val = str(row.get(col, '')).strip()
+                if val and val.lower() != 'nan' and (val.startswith('http') or val.startswith('www')) and val not in urls: 
+                    urls.append(val)
+
+        for i in range(min(5, len(urls))): mappings[f'img_{i+1}'] = urls[i]
+            
+        row_images = []
+        if len(urls) > 5:
+            for ext_url in urls[5:]: row_images.append((sku_key, ext_url))
+
+        if ui_data['is_us']:
+            mappings['shippingAndFulfillment::leadTime'] = 600
+            mappings['shippingAndFulfillment::replacementLeadTime'] = 120
+            
+            if not leave_carton_blank and isinstance(x_in, (int, float)) and x_in > 0 and y_in > 0 and z_in > 0:
+                # KAPSAYICI LTL KONTROLÜ (Tüm kolileri tarıyoruz)
+                total_lbs = sum(c[0] for c in raw_cartons) * 2.20462
+                total_vol_in3 = sum((c_x * c_y * c_z) for _, c_x, c_y, c_z in raw_cartons) * (0.393701 ** 3)
+                
+                is_ltl = False
+                for c_kg, c_x, c_y, c_z in raw_cartons:
+                    c_lbs = c_kg * 2.20462
+                    c_l = c_x * 0.393701
+                    c_w = c_y * 0.393701
+                    c_h = c_z * 0.393701
+                    dims = sorted([c_l, c_w, c_h], reverse=True)
+                    length = dims[0]
+                    girth = 2 * (dims[1] + dims[2])
+                    if c_lbs >= 150 or (length + girth) >= 165 or length >= 108:
+                        is_ltl = True
+                        break
+                        
+                fclass = calculate_freight_class_total(total_lbs, total_vol_in3)
+                
+                if is_ltl:
+                    mappings['shippingAndFulfillment::shipType'] = "LTL"
+                    mappings['shippingAndFulfillment::freightClass'] = fclass
+                else:
+                    mappings['shippingAndFulfillment::shipType'] = "Small Parcel"
+
+        record['missing'] = validate_column_mappings(col_map, mappings)
+
+        # Satırın tüm hücre yazımları önce burada toplanır (sütun harfi -> değer), sonra tek seferde uygulanır
+        row_writes = {}
+        for k, v in mappings.items():
+            if k in col_map and pd.notna(v) and str(v).strip() != '': 
+                row_writes[col_map[k]] = v
+
+        for wid, val in ui_data['dyn_drops'].items():
+            if wid in col_map and val:
+                if isinstance(val, list): final_str = "; ".join([str(pv) for pv in val if pv and str(pv) != 'None']) 
+                else: final_str = str(val)
+                if final_str: row_writes[col_map[wid]] = final_str
+
+        dim_writes = {
+            'h': convert_to_inch(raw_h) if ui_data['is_us'] else raw_h, 
+            'w': convert_to_inch(raw_w) if ui_data['is_us'] else raw_w, 
+            'd': convert_to_inch(raw_d) if ui_data['is_us'] else raw_d
+        }
+        for dim_type, wids in ui_data['dim_mappings'].items():
+            val = dim_writes[dim_type]
+            if val is not None:
+                for wid in wids:
+                    if wid in col_map: row_writes[col_map[wid]] = val
+
+        satirlar = [s.strip() for s in translate_features(feat_text, ui_data['is_us']).split('\n') if s.strip()]
+        bedding_note = generate_bedding_note(feat_text, raw_h, raw_w, b_info['bed_size'], ui_data['is_us'])
+        
+        all_feats = satirlar.copy()
+        if bedding_note: all_feats.append(bedding_note)
+        n_feats = len(all_feats)
+        
+        # Feature alanları aşağıda baştan yazılır; daha önce bu sütunlara düşen değerler atılır
+        for col in feature_cols: row_writes.pop(col, None)
+
+        if n_feats == 0:
+            if len(feature_cols) > 0: row_writes[feature_cols[0]] = "Made In Türkiye"
+        elif n_feats <= 4:
+            for i in range(n_feats):
+                if i < len(feature_cols): row_writes[feature_cols[i]] = all_feats[i]
+            if n_feats < len(feature_cols):
+                row_writes[feature_cols[n_feats]] = "Made In Türkiye"
+        else:
+            for i in range(4):
+                if i < len(feature_cols): row_writes[feature_cols[i]] = all_feats[i]
+            if len(feature_cols) >= 5:
+                remaining_text = " | ".join(all_feats[4:])
+                row_writes[feature_cols[4]] = f"{remaining_text} | Made In Türkiye"
+
+        # Yazılmayan Feature sütunları boşaltılacak hücrelerdir
+        record.update(writes=row_writes, clears=[c for c in feature_cols if c not in row_writes], images=row_images, cartons=row_cartons, urls=urls)
+    except Exception as e:
+        record['error'] = str(e)
+    return record
+
+def _init_row_worker(ctx):
+    global _worker_ctx
+    # fork ile kopyalanan önbellek kilitleri ebeveynde o an tutuluyor olabilir; çocukta yenilenir
+    for cache in (TEXT_CACHE, SHARED_CACHE): cache._lock = threading.Lock()
+    TEXT_CACHE.start_journal()
+    _worker_ctx = ctx
+
+def compute_row_records(bounds, ctx=None):
+    ctx = ctx or _worker_ctx
+    start, stop = bounds
+    return [compute_row_record(index, row, ctx) for index, row in ctx['df'].iloc[start:stop].iterrows()]
+
+def _compute_chunk(bounds):
+    # Parçayla birlikte yeni çeviri kayıtları ve sayaçlar da döner; ebeveyn kendi TEXT_CACHE'ine ekler
+    return compute_row_records(bounds), TEXT_CACHE.drain_journal()
+
+def iter_row_records(ctx, workers):
+    total_rows = len(ctx['df'])
+    bounds = [(s, min(s + PARALLEL_CHUNK_ROWS, total_rows)) for s in range(0, total_rows, PARALLEL_CHUNK_ROWS)]
+    done = 0
+    pool = fork_pool(min(workers, len(bounds)), initializer=_init_row_worker, initargs=(ctx,)) if total_rows >= PARALLEL_MIN_ROWS else None
+    if pool is not None:
+        try:
+            with pool:
+                # map sonuçları gönderim sırasıyla döner -> yazıcı satır sırasını korur
+                for chunk, journal in pool.map(_compute_chunk, bounds):
+                    TEXT_CACHE.merge(*journal)
+                    yield from chunk
+                    done += 1
+            return
+        except (BrokenProcessPool, OSError, pickle.PicklingError):
+            pass  # Havuz kurulamazsa/çökerse kalan parçalar bu süreçte sırayla hesaplanır
+    for b in bounds[done:]:
+        for index, row in ctx['df'].iloc[b[0]:b[1]].iterrows():
+            yield compute_row_record(index, row, ctx)
+
+def process_wayfair_v19(data_file, template_file, ui_data, carton_file=None, progress_callback=None, baseline_file=None, stage_callback=None):
+    # stage_callback(ad): her aşama (read, template, rows, save) bittiğinde çağrılır; bench.py bellek ölçümü için kullanır
+    template_file.seek(0)
+    baseline = build_baseline_index(baseline_file) if baseline_file is not None else None
+    
+    df_data = load_data_frame(data_file)
+    cat_col_name = next((col for col in df_data.columns if 'categor' in str(col).lower() or 'kategori' in str(col).lower()), None)
+    
+    carton_store = load_carton_store(carton_file) if carton_file is not None else None
+    if stage_callback: stage_callback('read')
+
+    wb = TEMPLATE_POOL.checkout(template_file)  # Şablon her seferinde yeniden parse edilmez; havuzdan taze kopya
+    target_sheet = next((s for s in wb.sheetnames if not any(x in s for x in TEMPLATE_SKIP_SHEETS)), wb.sheetnames[0])
+    ws_main = wb[target_sheet]
+    if stage_callback: stage_callback('template')
+
+    r1_vals, r4_vals = sheet_header_rows(ws_main)
+    col_map, feature_cols = template_column_map(r1_vals, r4_vals)
+    col_keys = dict(enumerate(header_keys(r1_vals), 1))
+    # Şablonda veri satırlarında önceden dolu Feature hücreleri; temizleme ("") sadece bunlara yazılır
+    prefilled_features = set()
+    if feature_cols and ws_main.max_row >= DATA_START_ROW:
+        for cells in ws_main.iter_rows(min_row=DATA_START_ROW, max_row=ws_main.max_row, min_col=min(feature_cols), max_col=max(feature_cols)):
+            prefilled_features.update((cell.row, cell.column) for cell in cells if cell.column in feature_cols and cell.value not in (None, ""))
+    
+    total_rows = len(df_data)
+    processed, skipped, errors = 0, [], []
+    delta_report = []
+    missing_cols_reported = False
+    written_rows, additional_images_data, additional_cartons_data = [], [], []   # koliler: (SKU, başlangıç, bitiş)
+    processed_skus_for_additional = set()
+    processed_skus_for_cartons = set()
+    sku_occurrences = {}   # Delta: SKU -> son geçişinin sırası (baseline satırıyla eşleştirmek için)
+    url_rows = []   # Resim linki doğrulaması açıksa: yazılan satırların linkleri
+
+    ctx = {
+        'df': df_data, 'columns': list(df_data.columns), 'col_map': col_map, 'feature_cols': feature_cols,
+        'cat_col_name': cat_col_name, 'carton_store': carton_store,
+        'ui_data': {k: ui_data[k] for k in ('is_us', 'dyn_drops', 'dim_mappings')},
+    }
+    workers = ui_data.get('workers') or default_workers(MAX_ROW_WORKERS)
+
+    for n, rec in enumerate(iter_row_records(ctx, workers), 1):
+        if progress_callback: progress_callback(n / total_rows)
+        index, sku_key = rec['index'], rec['sku']
+        g_satir = DATA_START_ROW + index
+
+        if not missing_cols_reported and rec['missing'] is not None:
+            if rec['missing']: ui_data['missing_cols'] = rec['missing']
+            missing_cols_reported = True
+
+        if rec['error'] is not None:
+            errors.append({'Satır': index + 2, 'Ürün Kodu': sku_key, 'Açıklama': rec['desc'], 'Hata Detayı': rec['error']})
+            continue
+
+        row_writes = rec['writes']
+        # Ek resim/koli satırları her SKU için sadece ilk geçtiği satırdan alınır
+        row_images = rec['images'] if sku_key not in processed_skus_for_additional else []
+        row_cartons = rec['cartons'] if sku_key not in processed_skus_for_cartons else ()
+
+        try:
+            if baseline is not None:
+                # DELTA: önceki yüklemeyle aynı olan SKU yazılmaz; yeni/değişen SKU'lar boşluksuz alt alta yazılır
+                occurrence = sku_occurrences[sku_key] = sku_occurrences.get(sku_key, -1) + 1
+                changed = diff_against_baseline(
+                    baseline, sku_key, occurrence, row_writes, col_keys,
+                    row_images if sku_key not in processed_skus_for_additional else None,
+                    (carton_store.rows(*row_cartons) if row_cartons else []) if sku_key not in processed_skus_for_cartons else None,
+                    ui_data['is_us'])
+                if changed is not None and not changed:
+                    skipped.append({'Satır': index + 2, 'Ürün Kodu': sku_key, 'Sebep': 'Önceki yüklemeyle aynı'})
+                    # Ekleri karşılaştırılıp aynı bulunan SKU'nun sonraki satırları ekleri yeniden karşılaştırmaz
+                    if row_images: processed_skus_for_additional.add(sku_key)
+                    if row_cartons: processed_skus_for_cartons.add(sku_key)
+                    continue
+                delta_report.append({'Ürün Kodu': sku_key, 'Durum': 'Yeni' if changed is None else 'Değişti', 'Değişen Alanlar': ", ".join(changed or [])})
+                g_satir = DATA_START_ROW + len(written_rows)
+
+            for col, v in row_writes.items(): ws_main.cell(row=g_satir, column=col, value=v)
+            for col in rec['clears']:
+                if (g_satir, col) in prefilled_features: ws_main.cell(row=g_satir, column=col).value = ""
+            if row_images:
+                additional_images_data.extend(row_images)
+                processed_skus_for_additional.add(sku_key)
+            if row_cartons:
+                additional_cartons_data.append((sku_key, *row_cartons))
+                processed_skus_for_cartons.add(sku_key)
+                    
+            processed += 1
+            written_rows.append(g_satir)
+            if ui_data.get('verify_images') and rec['urls']: url_rows.append((index, sku_key, rec['desc'], rec['urls']))
+            
+        except Exception as e: 
+            errors.append({'Satır': index + 2, 'Ürün Kodu': sku_key, 'Açıklama': rec['desc'], 'Hata Detayı': str(e)})
+
+    if url_rows:
+        # Tüm benzersiz linkler tek seferde, eşzamanlı kontrol edilir; kırık linkler hata tablosuna düşer (satır yine yazılır)
+        checker = ui_data.get('image_checker') or ImageUrlChecker()
+        verdicts = checker.verify([u for *_, urls in url_rows for u in urls])
+        broken_rows = 0
+        for index, sku_key, desc, urls in url_rows:
+            broken = [f"{url} ({verdicts[url][1]})" for url in urls if not verdicts[url][0]]
+            if broken:
+                broken_rows += 1
+                errors.append({'Satır': index + 2, 'Ürün Kodu': sku_key, 'Açıklama': desc, 'Hata Detayı': "Resim linki açılmıyor: " + "; ".join(broken)})
+        ui_data['image_check'] = {**checker.last_stats, 'rows': broken_rows}
+
+    yellow_fill = openpyxl.styles.PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+    for c in range(1, ws_main.max_column + 1):
+        if str(ws_main.cell(row=3, column=c).value).strip().lower() == "required":
+            for r in written_rows:
+                cell = ws_main.cell(row=r, column=c)
+                if cell.value is None or str(cell.value).strip() == "": cell.fill = yellow_fill
+
+    if additional_images_data:
+        add_sheet = next((wb[s] for s in wb.sheetnames if 'additional' in s.lower() and 'image' in s.lower()), None)
+        if add_sheet:
+            sku_col, url_col = additional_image_cols(*sheet_header_rows(add_sheet))
+            next_row = first_empty_row(add_sheet, sku_col)
+            for sku, url in additional_images_data:
+                add_sheet.cell(row=next_row, column=sku_col, value=sku)
+                add_sheet.cell(row=next_row, column=url_col, value=url)
+                next_row += 1
+
+    if additional_cartons_data:
+        add_carton_sheet = next((wb[s] for s in wb.sheetnames if 'additional' in s.lower() and ('carton' in s.lower() or 'package' in s.lower())), None)
+        if add_carton_sheet:
+            col_map_c = additional_carton_cols(*sheet_header_rows(add_carton_sheet))
+                    
+            if 'sku' in col_map_c:
+                sku_col = col_map_c['sku']
+                value_cols = [col_map_c.get(k) for k in ('weight', 'height', 'width', 'depth')]
+                next_row = first_empty_row(add_carton_sheet, sku_col)
+                for sku, start, stop in additional_cartons_data:
+                    for carton in carton_store.rows(start, stop):
+                        add_carton_sheet.cell(row=next_row, column=sku_col, value=sku)
+                        for col, v in zip(value_cols, carton_output_values(carton, ui_data['is_us'])):
+                            if col: add_carton_sheet.cell(row=next_row, column=col, value=v)
+                        next_row += 1
+
+    if baseline is not None: ui_data['delta_report'] = delta_report
+    if stage_callback: stage_callback('rows')
+    export = spool_workbook(wb, "Wayfair_Upload-Template.xlsx")
+    if stage_callback: stage_callback('save')
+    return export, processed, skipped, errors
+
+# --- DENEME ÇALIŞTIRMASI (örneklem) ---
+# Tam çalıştırmadan önce eşleme hatalarını görmek için: ilk satırlar + her kategoriden birkaç satır hesaplanır;
+# şablon workbook'u açılmaz, hiçbir şey yazılmaz/kaydedilmez (başlıklar önbellekteki şablon şemasından).
+DRY_RUN_FIRST_ROWS = 20
+DRY_RUN_PER_CATEGORY = 3
+
+def sample_row_positions(df_data, cat_col_name, first_rows=DRY_RUN_FIRST_ROWS, per_category=DRY_RUN_PER_CATEGORY):
+    # load_data_frame indeksi sıfırlar: etiket = konum
+    picked = set(range(min(first_rows, len(df_data))))
+    if cat_col_name:
+        picked.update(df_data.groupby(df_data[cat_col_name].astype(str).str.strip(), sort=False).head(per_category).index)
+    return sorted(picked)
+
+def dry_run_wayfair(data_file, template_file, ui_data, carton_file=None, first_rows=DRY_RUN_FIRST_ROWS, per_category=DRY_RUN_PER_CATEGORY):
+    started = time.monotonic()
+    df_data = load_data_frame(data_file)
+    cat_col_name = next((col for col in df_data.columns if 'categor' in str(col).lower() or 'kategori' in str(col).lower()), None)
+    carton_store = load_carton_store(carton_file) if carton_file is not None else None
+    r1_vals, r3_vals, r4_vals = load_template_schema(template_file)['header_rows']
+    col_map, feature_cols = template_column_map(r1_vals, r4_vals)
+    col_keys = dict(enumerate(header_keys(r1_vals), 1))
+
+    ctx = {
+        'df': df_data, 'columns': list(df_data.columns), 'col_map': col_map, 'feature_cols': feature_cols,
+        'cat_col_name': cat_col_name, 'carton_store': carton_store,
+        'ui_data': {k: ui_data[k] for k in ('is_us', 'dyn_drops', 'dim_mappings')},
+    }
+    positions = sample_row_positions(df_data, cat_col_name, first_rows, per_category)
+    mappings, errors, missing = [], [], {}
+    filled = dict.fromkeys(col_keys, 0)
+    extra_images = extra_cartons = 0
+    for index, row in df_data.iloc[positions].iterrows():
+        rec = compute_row_record(index, row, ctx)
+        if rec['error'] is not None:
+            errors.append({'Satır': index + 2, 'Ürün Kodu': rec['sku'], 'Açıklama': rec['desc'], 'Hata Detayı': rec['error']})
+            continue
+        # Tam çalıştırma sadece ilk satırın eksiklerini raporlar; örneklemde kategoriye özgü alanlar da görünsün diye birleşim alınır
+        missing.update(dict.fromkeys(rec['missing'] or []))
+        mapped = {'Satır': index + 2, 'Ürün Kodu': rec['sku']}
+        if cat_col_name: mapped['Kategori'] = row.get(cat_col_name, '')
+        for col, v in sorted(rec['writes'].items()):
+            filled[col] += 1
+            mapped[col_keys[col]] = v
+        mappings.append(mapped)
+        extra_images += len(rec['images'])
+        if rec['cartons']: extra_cartons += rec['cartons'][1] - rec['cartons'][0]
+
+    sampled = len(mappings)
+    coverage = [{'Sütun': c, 'Alan': col_keys[c], 'Başlık': str(r4_vals[c - 1] or '').strip(),
+                 'Zorunlu': str(r3_vals[c - 1] or '').strip().lower() == 'required',
+                 'Dolu': filled[c], 'Oran': round(filled[c] / sampled, 2) if sampled else 0.0}
+                for c in col_keys if str(r1_vals[c - 1] or '').strip()]
+    return {
+        'rows_total': len(df_data), 'rows_sampled': len(positions),
+        'categories': int(df_data[cat_col_name].astype(str).str.strip().nunique()) if cat_col_name else 0,
+        'mappings': mappings, 'coverage': coverage, 'missing_cols': list(missing), 'errors': errors,
+        'extra_images': extra_images, 'extra_cartons': extra_cartons, 'seconds': round(time.monotonic() - started, 2),
+    }
+
+def process_data_excel_only(data_file, is_us, stage_callback=None):
+    # stage_callback(ad): load, transform, style, save aşamaları bittikçe çağrılır
+    data_file.seek(0)
+    wb = openpyxl.load_workbook(data_file)
+    ws = wb.active
+    if stage_callback: stage_callback('load')
+
+    if hasattr(ws, '_images'): ws._images = []
+
+    def get_headers():
+        h = {}
+        for c in range(1, ws.max_column + 1):
+            v = ws.cell(row=1, column=c).value
+            if v: h[str(v).strip()] = c
+        return h
+
+    headers = get_headers()
+    code_col = headers.get('CODE')
+    if code_col:
+        for row in range(ws.max_row, 1, -1):
+            val = ws.cell(row=row, column=code_col).value
+            if val is None or str(val).strip() == '': ws.delete_rows(row, 1)
+                
+    headers = get_headers()
+    ean_col = headers.get('EAN CODE')
+    if ean_col:
+        for row in range(2, ws.max_row + 1):
+            cell = ws.cell(row=row, column=ean_col)
+            if cell.value is not None:
+                try: cell.value = int(float(str(cell.value).strip())); cell.number_format = '0'
+                except: cell.value = str(cell.value).strip(); cell.number_format = '@'
+
+    color_col = headers.get('COLOR')
+    if color_col:
+        for row in range(2, ws.max_row + 1):
+            cell = ws.cell(row=row, column=color_col)
+            if cell.value:
+                c_val = str(cell.value)
+                if c_val.lower() != 'nan':
+                    c_val = c_val.replace('\n', ';').replace(',', ';').replace('/', ';')
+                    cell.value = re.sub(r'\s*;\s*', '; ', c_val).strip('; ')
+
+    ef_col = headers.get('EXTRA FEATURES')
+    if ef_col:
+        for row in range(2, ws.max_row + 1):
+            cell = ws.cell(row=row, column=ef_col)
+            if cell.value: cell.value = translate_features(str(cell.value), is_us)
+
+    feat_col = headers.get('FEATURES')
+    if feat_col:
+        ws.insert_cols(feat_col + 1, 5)
+        ref_header = ws.cell(row=1, column=feat_col)
+        ref_col_letter = get_column_letter(feat_col)
+        ref_width = ws.column_dimensions[ref_col_letter].width
+        
+        for i, f_name in enumerate(['Feature 1', 'Feature 2', 'Feature 3', 'Feature 4', 'Feature 5']):
+            target_col_idx = feat_col + 1 + i
+            target_col_letter = get_column_letter(target_col_idx)
+            nc = ws.cell(row=1, column=target_col_idx)
+            nc.value = f_name
+            if ref_width: ws.column_dimensions[target_col_letter].width = ref_width
+            if ref_header.has_style:
+                nc.font = copy.copy(ref_header.font); nc.border = copy.copy(ref_header.border)
+                nc.fill = copy.copy(ref_header.fill); nc.alignment = copy.copy(ref_header.alignment)
+
+        for row in range(2, ws.max_row + 1):
+            cell = ws.cell(row=row, column=feat_col)
+            features_to_write = ["", "", "", "", ""]
+            
+            if cell.value:
+                translated = translate_features(str(cell.value), is_us)
+                lines = [s.strip() for s in translated.split('\n') if s.strip()]
+            else:
+                lines = []
+                
+            n = len(lines)
+            if n == 0:
+                features_to_write[0] = "Made In Türkiye"
+            elif n <= 4:
+                for idx in range(n): features_to_write[idx] = lines[idx]
+                features_to_write[n] = "Made In Türkiye"
+            else:
+                for idx in range(4): features_to_write[idx] = lines[idx]
+                remaining_text = " | ".join(lines[4:])
+                features_to_write[4] = f"{remaining_text} | Made In Türkiye"
+
+            ws.cell(row=row, column=feat_col + 1).value = features_to_write[0]
+            ws.cell(row=row, column=feat_col + 2).value = features_to_write[1]
+            ws.cell(row=row, column=feat_col + 3).value = features_to_write[2]
+            ws.cell(row=row, column=feat_col + 4).value = features_to_write[3]
+            ws.cell(row=row, column=feat_col + 5).value = features_to_write[4]
+
+    if is_us:
+        headers = get_headers()
+        w_col, x_col, y_col, z_col = headers.get('WEIGHT (Kg)'), headers.get('PACKAGING SIZE - X (cm)'), headers.get('PACKAGING SIZE - Y (cm)'), headers.get('PACKAGING SIZE - Z (cm)')
+        metric_cols = [c for c in [w_col, x_col, y_col, z_col] if c is not None]
+        if metric_cols:
+            insert_idx = max(metric_cols) + 1
+            ws.insert_cols(insert_idx, 4)
+            ws.cell(row=1, column=insert_idx).value = 'WEIGHT (Lbs)'
+            ws.cell(row=1, column=insert_idx + 1).value = 'PACKAGING SIZE - X (in)'
+            ws.cell(row=1, column=insert_idx + 2).value = 'PACKAGING SIZE - Y (in)'
+            ws.cell(row=1, column=insert_idx + 3).value = 'PACKAGING SIZE - Z (in)'
+            
+            ref_h = ws.cell(row=1, column=metric_cols[0])
+            for i in range(4):
+                nh = ws.cell(row=1, column=insert_idx + i)
+                if ref_h.has_style:
+                    nh.font = copy.copy(ref_h.font); nh.border = copy.copy(ref_h.border)
+                    nh.fill = copy.copy(ref_h.fill); nh.alignment = copy.copy(ref_h.alignment)
+                    
+            for row in range(2, ws.max_row + 1):
+                if w_col:
+                    val = ws.cell(row=row, column=w_col).value
+                    try: ws.cell(row=row, column=insert_idx).value = round(float(val) * 2.20462, 2)
+                    except: pass
+                if x_col:
+                    val = ws.cell(row=row, column=x_col).value
+                    try: ws.cell(row=row, column=insert_idx + 1).value = round(float(val) * 0.393701, 2)
+                    except: pass
+                if y_col:
+                    val = ws.cell(row=row, column=y_col).value
+                    try: ws.cell(row=row, column=insert_idx + 2).value = round(float(val) * 0.393701, 2)
+                    except: pass
+                if z_col:
+                    val = ws.cell(row=row, column=z_col).value
+                    try: ws.cell(row=row, column=insert_idx + 3).value = round(float(val) * 0.393701, 2)
+                    except: pass
+
+    headers = get_headers()
+    img_cols = []
+    for col_name, col_idx in headers.items():
+        name_lower = col_name.lower()
+        if 'image' in name_lower or 'resim' in name_lower or 'url' in name_lower or 'link' in name_lower: img_cols.append((col_idx, col_name))
+            
+    if img_cols:
+        img_cols.sort(key=lambda x: x[0], reverse=True)
+        extracted_cols = []
+        for col_idx, col_name in img_cols:
+            col_data = []
+            col_letter = get_column_letter(col_idx)
+            col_width = ws.column_dimensions[col_letter].width
+            for row in range(1, ws.max_row + 1):
+                cell = ws.cell(row=row, column=col_idx)
+                cell_data = {
+                    'value': cell.value, 'font': copy.copy(cell.font) if cell.has_style and cell.font else None,
+                    'border': copy.copy(cell.border) if cell.has_style and cell.border else None,
+                    'fill': copy.copy(cell.fill) if cell.has_style and cell.fill else None,
+                    'alignment': copy.copy(cell.alignment) if cell.has_style and cell.alignment else None, 'number_format': cell.number_format
+                }
+                col_data.append(cell_data)
+            extracted_cols.append({'name': col_name, 'width': col_width, 'data': col_data})
+            ws.delete_cols(col_idx, 1)
+            
+        extracted_cols.reverse()
+        for col_dict in extracted_cols:
+            new_col_idx = ws.max_column + 1
+            new_col_letter = get_column_letter(new_col_idx)
+            if col_dict['width']: ws.column_dimensions[new_col_letter].width = col_dict['width']
+            for row_idx, c_data in enumerate(col_dict['data'], start=1):
+                new_cell = ws.cell(row=row_idx, column=new_col_idx)
+                new_cell.value = c_data['value']
+                if c_data['font']: new_cell.font = c_data['font']
+                if c_data['border']: new_cell.border = c_data['border']
+                if c_data['fill']: new_cell.fill = c_data['fill']
+                if c_data['alignment']: new_cell.alignment = c_data['alignment']
+                if c_data['number_format']: new_cell.number_format = c_data['number_format']
+
+    if stage_callback: stage_callback('transform')
+    medium_border = Border(left=Side(style='medium', color='000000'), right=Side(style='medium', color='000000'), top=Side(style='medium', color='000000'), bottom=Side(style='medium', color='000000'))
+    column_colors = {
+        'Feature 1': "DDEBF7", 'Feature 2': "E2EFDA", 'Feature 3': "FFF2CC", 'Feature 4': "FCE4D6", 'Feature 5': "E8D8FC",
+        'WEIGHT (Lbs)': "F8CECC", 'PACKAGING SIZE - X (in)': "D1F2EB", 'PACKAGING SIZE - Y (in)': "E8F8F5", 'PACKAGING SIZE - Z (in)': "E6F2F7"
+    }
+    
+    headers = get_headers()
+    for col_name, col_idx in headers.items():
+        col_letter = get_column_letter(col_idx)
+        ws.column_dimensions[col_letter].width = 12
+        col_color_hex = column_colors.get(col_name)
+        col_fill = PatternFill(start_color=col_color_hex, end_color=col_color_hex, fill_type="solid") if col_color_hex else None
+            
+        for row in range(1, ws.max_row + 1):
+            cell = ws.cell(row=row, column=col_idx)
+            cell.border = medium_border
+            if row == 1: cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+            else:
+                cell.alignment = Alignment(horizontal='justify', vertical='center', wrap_text=True)
+                is_bold = cell.font.bold if (cell.font and cell.font.bold is not None) else False
+                is_italic = cell.font.italic if (cell.font and cell.font.italic is not None) else False
+                cell.font = Font(name='Tahoma', size=8, bold=is_bold, italic=is_italic)
+                if col_fill: cell.fill = col_fill
+
+    for row in range(1, ws.max_row + 1): ws.row_dimensions[row].height = 18
+    if stage_callback: stage_callback('style')
+
+    export = spool_workbook(wb, "Converted_Data_Excel.xlsx")
+    if stage_callback: stage_callback('save')
+    return export
@@ -0,0 +1,186 @@
+import io
+import math
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import as_completed
+import pandas as pd
+from openpyxl.styles import Alignment
+from procpool import fork_pool, default_workers
+
+# --- CONSTANTS ---
+KG_TO_LBS = 2.20462
+CM_TO_INCH = 0.393701
+MADE_IN_TURKEY = "Made In Türkiye"
+
+# --- HELPER FUNCTIONS (GENERAL & WF TEMPLATE TOOL) ---
+def extract_dimensions_from_string(text_to_search):
+    def find_dimension_value(pattern, text):
+        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        if match:
+            try:
+                value_str = match.group(1).replace(',', '.')
+                return float(value_str)
+            except: return None
+        return None
+    w = find_dimension_value(r'(?:Width|Genişlik):\s*(\d+(?:[.,]\d+)?)', text_to_search)
+    h = find_dimension_value(r'(?:Height|Yükseklik):\s*(\d+(?:[.,]\d+)?)', text_to_search)
+    d = find_dimension_value(r'(?:Depth|Derinlik):\s*(\d+(?:[.,]\d+)?)', text_to_search)
+    l = find_dimension_value(r'(?:Length|Uzunluk):\s*(\d+(?:[.,]\d+)?)', text_to_search)
+    diam = find_dimension_value(r'(?:Diameter|Çap):\s*(\d+(?:[.,]\d+)?)', text_to_search)
+    y_val = d if d is not None else l
+    if w is not None and h is not None and y_val is not None: return (w, y_val, h)
+    if diam is not None and h is not None: return (diam, diam, h)
+    xyz_pattern = r'(\d+(?:[.,]\d+)?)\s*[xX]\s*(\d+(?:[.,]\d+)?)(?:\s*[xX]\s*(\d+(?:[.,]\d+)?))?'
+    match = re.search(xyz_pattern, text_to_search)
+    if match:
+        try:
+            x = float(match.group(1).replace(',', '.'))
+            y = float(match.group(2).replace(',', '.'))
+            z = float(match.group(3).replace(',', '.')) if match.group(3) else None
+            return (x, y, z)
+        except: return None
+    return None
+
+def clean_feature_list(features_str):
+    if pd.isna(features_str) or features_str == "": return []
+    features = re.split(r'\s*(?:\\n|\n)\s*', str(features_str).strip())
+    return [f.strip() for f in features if f and f.strip()]
+
+def convert_size_value(val, unit_choice):
+    if val is None or val == '' or (isinstance(val, float) and math.isnan(val)): return ''
+    try:
+        num_val = float(str(val).replace(',', '.'))
+        return round(num_val * CM_TO_INCH, 2) if unit_choice == "inch" else round(num_val, 2)
+    except: return val
+
+def convert_weight_value(val_kg, weight_unit_choice):
+    if val_kg is None or val_kg == '' or (isinstance(val_kg, float) and math.isnan(val_kg)): return ''
+    try:
+        num_val = float(str(val_kg).replace(',', '.'))
+        if weight_unit_choice == "LBS":
+            c_lbs = round(num_val * KG_TO_LBS, 2)
+            return c_lbs, max(0.0, round(c_lbs - 0.01, 2))
+        return round(num_val, 2), round(num_val, 2)
+    except: return val_kg, val_kg
+
+# --- CONVERSION (WF TEMPLATE TOOL) ---
+def build_output_headers(size_unit, weight_unit, feature_count):
+    f_headers = [f'Feature {i+1}' for i in range(feature_count)]
+    u_s, u_w = f"({size_unit})", f"({weight_unit})"
+    return ['CODE', 'EAN CODE', 'COLOR', 'DESCRIPTION'] + f_headers + \
+           ['IMAGE', 'PRICE', ' ', 'RETAIL PRICE', 'NUMBER OF PACKAGES', f'WEIGHT {u_w}',
+            f'PRODUCT SIZE - X {u_s}', f'PRODUCT SIZE - Y {u_s}', f'PRODUCT SIZE - Z {u_s}',
+            f'CARTON WEIGHT {u_w}', f'PACKAGING SIZE - X {u_s}', f'PACKAGING SIZE - Y {u_s}', f'PACKAGING SIZE - Z {u_s}']
+
+def convert_template_frame(df, size_unit, weight_unit, add_made_in_tr, feature_count):
+    processed_data = []
+    output_headers = build_output_headers(size_unit, weight_unit, feature_count)
+
+    for index, row in df.iterrows():
+        code = str(row.get('CODE', '')).strip()
+        if not code or code.lower() == 'nan': continue
+        feat_list = clean_feature_list(row.get('FEATURES', ''))
+        extra = str(row.get('EXTRA FEATURES', ''))
+        if "number of packages" not in extra.lower(): feat_list.extend(clean_feature_list(extra))
+        if add_made_in_tr and not any(MADE_IN_TURKEY in str(f) for f in feat_list): feat_list.append(MADE_IN_TURKEY)
+        
+        f_cols = [""] * feature_count
+        if feature_count > 1:
+            for i in range(min(len(feat_list), feature_count - 1)): f_cols[i] = feat_list[i]
+            if len(feat_list) >= feature_count: f_cols[feature_count-1] = "\n".join(feat_list[feature_count-1:])
+        elif feat_list: f_cols[0] = "\n".join(feat_list)
+
+        dims = extract_dimensions_from_string(str(row.get('FEATURES', '')) + "\n" + extra)
+        px, py, pz = dims if dims else ('', '', '')
+        c_w, p_w = convert_weight_value(row.get('WEIGHT (Kg)', ''), weight_unit)
+
+        processed_data.append([code, row.get('EAN CODE', ''), str(row.get('COLOR', '')).replace('\n', ';'), row.get('DESCRIPTION', '')] + f_cols + \
+                              [row.get('IMAGE', ''), row.get('PRICE', ''), '', row.get('RETAIL PRICE', ''), row.get('NUMBER OF PACKAGES', ''),
+                               p_w, convert_size_value(px, size_unit), convert_size_value(py, size_unit), convert_size_value(pz, size_unit),
+                               c_w, convert_size_value(row.get('PACKAGING SIZE - X (cm)', ''), size_unit),
+                               convert_size_value(row.get('PACKAGING SIZE - Y (cm)', ''), size_unit), convert_size_value(row.get('PACKAGING SIZE - Z (cm)', ''), size_unit)])
+
+    return pd.DataFrame(processed_data, columns=output_headers)
+
+def write_formatted_template(output, out_df):
+    output_headers = list(out_df.columns)
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        out_df.to_excel(writer, index=False, sheet_name='Sheet1')
+        ws = writer.sheets['Sheet1']
+        al_center = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        al_left = Alignment(horizontal='left', vertical='center', wrap_text=True)
+        for c_idx, c_name in enumerate(output_headers, 1):
+            letter = ws.cell(row=1, column=c_idx).column_letter
+            if "Feature" in str(c_name): ws.column_dimensions[letter].width = 15
+            elif any(w in str(c_name) for w in ["PRICE", "SIZE", "WEIGHT", "PACKAGES"]):
+                m_data = max([len(str(ws.cell(row=r, column=c_idx).value)) for r in range(2, len(out_df)+2)] + [0])
+                ws.column_dimensions[letter].width = m_data + 5
+            else:
+                m_all = max([len(str(ws.cell(row=r, column=c_idx).value)) for r in range(1, len(out_df)+2)] + [0])
+                ws.column_dimensions[letter].width = min(m_all + 2, 40)
+            for r_idx in range(1, len(out_df) + 2):
+                cell = ws.cell(row=r_idx, column=c_idx)
+                cell.alignment = al_left if (r_idx > 1 and "Feature" in str(c_name)) else al_center
+                if r_idx > 1: ws.row_dimensions[r_idx].height = 15
+        ws.row_dimensions[1].height = 45
+
+# --- BATCH MODE (WF TEMPLATE TOOL) ---
+BATCH_WORKERS = int(os.environ.get("ASIR_BATCH_WORKERS", "4"))
+BATCH_SUMMARY_NAME = "_summary.csv"
+
+def processed_file_name(file_name):
+    file_base, file_ext = os.path.splitext(file_name)
+    return f"{file_base}_processed{file_ext}"
+
+def convert_template_bytes(data, size_unit, weight_unit, add_made_in_tr, feature_count):
+    # İşçi süreçte çalışır: süreçler arasında sadece byte'lar taşınır
+    started = time.monotonic()
+    df = pd.read_excel(io.BytesIO(data), dtype=str).fillna('')
+    out_df = convert_template_frame(df, size_unit, weight_unit, add_made_in_tr, feature_count)
+    output = io.BytesIO()
+    write_formatted_template(output, out_df)
+    return output.getvalue(), len(df), len(out_df), time.monotonic() - started
+
+def iter_batch_results(files, settings, workers=None):
+    # files: [(ad, byte)] -> her dosya bittikçe (sıra, sonuç veya hata) döner
+    pool = fork_pool(min(workers or default_workers(BATCH_WORKERS), len(files)))
+    if pool is not None:
+        with pool:
+            # En büyük dosyalar önce: toplu iş en yavaş tek dosyaya yakın bir sürede biter
+            order = sorted(range(len(files)), key=lambda pos: len(files[pos][1]), reverse=True)
+            futures = {pool.submit(convert_template_bytes, files[pos][1], *settings): pos for pos in order}
+            for future in as_completed(futures):
+                try: yield futures[future], future.result()
+                except Exception as e: yield futures[future], e
+        return
+    for pos, (_, data) in enumerate(files):
+        try: yield pos, convert_template_bytes(data, *settings)
+        except Exception as e: yield pos, e
+
+def write_template_batch(output, files, settings, progress_callback=None, workers=None):
+    # Biten her workbook hemen zip'e yazılır; özet en sona eklenir
+    summary = [{'File': name, 'Output': '', 'Rows In': 0, 'Rows Out': 0, 'Seconds': 0.0, 'Error': ''} for name, _ in files]
+    used_names = set()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as zf:   # xlsx zaten sıkıştırılmış
+        for done, (pos, result) in enumerate(iter_batch_results(files, settings, workers), 1):
+            row = summary[pos]
+            if isinstance(result, Exception):
+                row['Error'] = f"{type(result).__name__}: {result}"
+            else:
+                blob, row['Rows In'], row['Rows Out'], seconds = result
+                row['Seconds'] = round(seconds, 2)
+                arc_name = base_name = processed_file_name(row['File'])
+                n = 1
+                while arc_name in used_names:
+                    n += 1
+                    stem, ext = os.path.splitext(base_name)
+                    arc_name = f"{stem} ({n}){ext}"
+                used_names.add(arc_name)
+                row['Output'] = arc_name
+                zf.writestr(arc_name, blob)
+            if progress_callback: progress_callback(done, len(files), row['File'])
+        summary_df = pd.DataFrame(summary)
+        zf.writestr(BATCH_SUMMARY_NAME, summary_df.to_csv(index=False))
+    return summary_df